@@ -2,21 +2,24 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models.user import User
-from app.core.security import get_current_user, oauth2_scheme
+from app.core.security import Principal, get_current_user, oauth2_scheme
+from app.core.storage import StorageBackend, get_storage
 
 
 # Database session dependency
 DbSession = Annotated[AsyncSession, Depends(get_db)]
 
+# Media storage dependency
+Storage = Annotated[StorageBackend, Depends(get_storage)]
+
 
 async def get_authenticated_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: DbSession,
-) -> User:
+) -> Principal:
     """Get current authenticated user using OAuth2 Bearer token."""
     return await get_current_user(token, db)
 
 
 # Type alias for authenticated user dependency
-CurrentUser = Annotated[User, Depends(get_authenticated_user)]
+CurrentUser = Annotated[Principal, Depends(get_authenticated_user)]
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+from app.api.deps import Storage
+from app.config import get_settings
+from app.core.storage import LocalStorage
+
+settings = get_settings()
+
+router = APIRouter()
+
+
+@router.get("/{key:path}", include_in_schema=False)
+async def get_media(key: str, storage: Storage) -> FileResponse:
+    """
+    Serve a file written by `LocalStorage`.
+    
+    Keys are never reused, so responses are cacheable indefinitely.
+    FileResponse handles Range requests and sets ETag/Last-Modified.
+    """
+    path = storage.resolve(key) if isinstance(storage, LocalStorage) else None
+    if path is None or not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found",
+        )
+    
+    return FileResponse(
+        path,
+        headers={"Cache-Control": f"public, max-age={settings.media_cache_max_age}, immutable"},
+    )
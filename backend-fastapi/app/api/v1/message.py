@@ -1,12 +1,13 @@
 import uuid
-from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from fastapi import APIRouter, Query, status
 from app.api.deps import CurrentUser, DbSession
-from app.models.message import Message
-from app.models.conversation import Conversation
-from app.models.user import User
+from app.core.pagination import encode_cursor
+from app.core.serialization import ModelResponse, dump_json, embed_json
 from app.schemas.message import MessageRequest, MessageResponse, SendMessageResponse, GetMessagesResponse
+from app.repositories.conversation import ConversationRepository
+from app.repositories.message import MessageRepository
+from app.repositories.user import UserRepository
+from app.services.message import MessageService
 from app.websocket.manager import manager
 
 router = APIRouter()
@@ -18,84 +19,56 @@ async def send_message(
     request: MessageRequest,  # Pydantic validates automatically
     current_user: CurrentUser,
     db: DbSession,
-) -> dict:
+) -> ModelResponse:
     """Send a message to another user."""
-    # Find or create conversation
-    result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.participants))
+    service = MessageService(
+        MessageRepository(db),
+        ConversationRepository(db),
+        UserRepository(db),
     )
-    conversations = result.scalars().all()
     
-    conversation = None
-    for conv in conversations:
-        participant_ids = {p.id for p in conv.participants}
-        if current_user.id in participant_ids and receiver_id in participant_ids:
-            conversation = conv
-            break
+    message = await service.send_message(current_user.id, receiver_id, request.message)
     
-    if not conversation:
-        # Get receiver
-        result = await db.execute(select(User).where(User.id == receiver_id))
-        receiver = result.scalar_one_or_none()
-        
-        if not receiver:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receiver not found")
-        
-        # Create new conversation
-        conversation = Conversation()
-        conversation.participants.append(current_user)
-        conversation.participants.append(receiver)
-        db.add(conversation)
-        await db.flush()
+    # Validate and serialize once; the same bytes go out over WebSocket and HTTP
+    data = dump_json(MessageResponse.model_validate(message))
+    await manager.send_message(str(receiver_id), data)
     
-    # Create message
-    message = Message(
-        sender_id=current_user.id,
-        receiver_id=receiver_id,
-        message=request.message,
-        conversation_id=conversation.id,
+    return ModelResponse(
+        embed_json(data, "new_message", success=True),
+        status_code=status.HTTP_201_CREATED,
     )
-    db.add(message)
-    await db.flush()
-    await db.refresh(message)
-    
-    # Send via WebSocket
-    await manager.send_message(
-        str(receiver_id),
-        MessageResponse.model_validate(message).model_dump(mode="json"),
-    )
-    
-    return {
-        "success": True,
-        "new_message": MessageResponse.model_validate(message),
-    }
 
 
 @router.get("/conversation/{receiver_id}", response_model=GetMessagesResponse)
-async def get_messages(receiver_id: uuid.UUID, current_user: CurrentUser, db: DbSession) -> dict:
-    """Get all messages in a conversation with another user."""
-    # Find conversation
-    result = await db.execute(
-        select(Conversation)
-        .options(
-            selectinload(Conversation.participants),
-            selectinload(Conversation.messages),
-        )
-    )
-    conversations = result.scalars().all()
+async def get_messages(
+    receiver_id: uuid.UUID,
+    current_user: CurrentUser,
+    db: DbSession,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    after: str | None = None,
+) -> ModelResponse:
+    """
+    Get a page of messages in a conversation with another user.
     
-    conversation = None
-    for conv in conversations:
-        participant_ids = {p.id for p in conv.participants}
-        if current_user.id in participant_ids and receiver_id in participant_ids:
-            conversation = conv
-            break
+    With no cursor, returns the latest messages. Use `before` to scroll
+    back and `after` to catch up after a reconnect.
+    """
+    service = MessageService(
+        MessageRepository(db),
+        ConversationRepository(db),
+        UserRepository(db),
+    )
     
-    if not conversation:
-        return {"success": True, "messages": []}
+    messages, has_more = await service.get_conversation_messages(
+        current_user.id, receiver_id, limit, before=before, after=after
+    )
     
-    return {
-        "success": True,
-        "messages": [MessageResponse.model_validate(m) for m in conversation.messages],
-    }
+    return ModelResponse(GetMessagesResponse(
+        success=True,
+        messages=[MessageResponse.model_validate(m) for m in messages],
+        has_more=has_more,
+        before_cursor=encode_cursor(messages[0].created_at, messages[0].id) if messages else None,
+        # Keep the caller's position when nothing new arrived
+        after_cursor=encode_cursor(messages[-1].created_at, messages[-1].id) if messages else after,
+    ))
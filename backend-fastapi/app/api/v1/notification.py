@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Query
+from app.api.deps import CurrentUser, DbSession
+from app.core.serialization import ModelResponse
+from app.schemas.notification import NotificationResponse, NotificationListResponse, MarkReadRequest
+from app.schemas.user import MessageResponse
+from app.repositories.notification import NotificationRepository
+from app.services.notification import NotificationService
+
+router = APIRouter()
+
+
+@router.get("", response_model=NotificationListResponse)
+async def get_notifications(
+    current_user: CurrentUser,
+    db: DbSession,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    unread_only: bool = True,
+) -> ModelResponse:
+    """
+    Get the current user's notifications, most recent activity first.
+    
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    """
+    service = NotificationService(NotificationRepository(db))
+    
+    notifications, next_cursor = await service.get_notifications(
+        current_user.id, limit, unread_only, cursor
+    )
+    
+    return ModelResponse(NotificationListResponse(
+        notifications=[NotificationResponse.model_validate(n) for n in notifications],
+        unread_count=await service.count_unread(current_user.id),
+        next_cursor=next_cursor,
+    ))
+
+
+@router.post("/read", response_model=MessageResponse)
+async def mark_notifications_read(
+    request: MarkReadRequest,
+    current_user: CurrentUser,
+    db: DbSession,
+) -> MessageResponse:
+    """Mark notifications read - the given `ids`, or all of them."""
+    service = NotificationService(NotificationRepository(db))
+    
+    count = await service.mark_read(current_user.id, request.ids)
+    
+    return MessageResponse(message=f"{count} notifications marked read")
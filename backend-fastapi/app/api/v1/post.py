@@ -1,16 +1,22 @@
 import uuid
-from io import BytesIO
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Response
-from PIL import Image
-from app.api.deps import CurrentUser, DbSession
-from app.schemas.post import PostResponse, PostCreateResponse, PostListResponse
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Request, Response, Query
+from app.api.deps import CurrentUser, DbSession, Storage
+from app.config import get_settings
+from app.schemas.post import PostAuthor, PostResponse, PostCreateResponse, PostListResponse, PostLikesResponse
 from app.schemas.comment import CommentRequest, CommentResponse, CommentsListResponse
 from app.schemas.user import MessageResponse
-from app.core.cloudinary import upload_image
+from app.core.uploads import open_image_upload, upload_path
+from app.core.etag import etag_matches, set_etag, not_modified
+from app.core.serialization import ModelResponse
 from app.repositories.post import PostRepository
 from app.repositories.comment import CommentRepository
+from app.repositories.image import ImageAssetRepository
 from app.services.post import PostService
 from app.services.comment import CommentService
+from app.services.image import ImageService
+from app.services.publisher import post_publisher
+
+settings = get_settings()
 
 router = APIRouter()
 
@@ -19,25 +25,39 @@ router = APIRouter()
 async def create_post(
     current_user: CurrentUser,
     db: DbSession,
+    storage: Storage,
     image: UploadFile = File(...),
     caption: str = Form(""),
 ) -> PostCreateResponse:
-    """Create a new post with image upload."""
-    # Process image
-    content = await image.read()
-    img = Image.open(BytesIO(content))
-    img.thumbnail((800, 800))
-    buffer = BytesIO()
-    img.save(buffer, format="JPEG", quality=80)
-    buffer.seek(0)
+    """
+    Create a new post with image upload.
     
-    image_url = await upload_image(buffer.getvalue())
+    In deferred publish mode the post is returned in the `processing`
+    state and the author receives a `post_ready` (or `post_failed`)
+    WebSocket event once the image is published.
+    """
+    upload = await open_image_upload(image)
     
     # Create post via service
     repo = PostRepository(db)
     service = PostService(repo)
     
-    post = await service.create_post(caption, image_url, current_user.id)
+    if settings.post_publish_mode == "deferred":
+        post = await service.create_pending_post(caption, current_user.id, *post_publisher.new_lease())
+        await post_publisher.stage(post.id, upload)
+        # Commit before queueing so the worker can see the post
+        await db.commit()
+        post_publisher.enqueue(post.id)
+        
+        return PostCreateResponse(
+            message="Post is being processed",
+            post=PostResponse.model_validate(post),
+        )
+    
+    # Generate and store image derivatives off the event loop
+    async with upload_path(upload) as path:
+        asset = await ImageService(ImageAssetRepository(db), storage).store_post_image(path)
+    post = await service.create_post(caption, asset.image, current_user.id, asset.variants)
     
     return PostCreateResponse(
         message="Post created successfully",
@@ -46,29 +66,66 @@ async def create_post(
 
 
 @router.get("", response_model=PostListResponse)
-async def get_all_posts(db: DbSession, current_user: CurrentUser) -> PostListResponse:
-    """Get all posts."""
+async def get_all_posts(
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+) -> PostListResponse | Response:
+    """
+    Get the global feed, newest first.
+    
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    Send the returned `ETag` as `If-None-Match` to get a 304 if the page
+    hasn't changed. Pages are served pre-serialized from the feed cache.
+    """
     repo = PostRepository(db)
     service = PostService(repo)
     
-    posts = await service.get_all_posts()
+    page = await service.get_feed_page(limit, cursor)
+    if etag_matches(request, page.etag):
+        return not_modified(page.etag)
     
-    return PostListResponse(
+    response = Response(content=page.body, media_type="application/json")
+    set_etag(response, page.etag)
+    return response
+
+
+@router.get("/timeline", response_model=PostListResponse)
+async def get_timeline(
+    db: DbSession,
+    current_user: CurrentUser,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+) -> ModelResponse:
+    """
+    Get the home timeline: posts by the current user and accounts they follow.
+    
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    """
+    repo = PostRepository(db)
+    service = PostService(repo)
+    
+    posts, next_cursor = await service.get_timeline(current_user.id, limit, cursor)
+    
+    return ModelResponse(PostListResponse(
         posts=[PostResponse.model_validate(p) for p in posts],
-    )
+        next_cursor=next_cursor,
+    ))
 
 
 @router.get("/me", response_model=PostListResponse)
-async def get_my_posts(current_user: CurrentUser, db: DbSession) -> PostListResponse:
+async def get_my_posts(current_user: CurrentUser, db: DbSession) -> ModelResponse:
     """Get current user's posts."""
     repo = PostRepository(db)
     service = PostService(repo)
     
     posts = await service.get_user_posts(current_user.id)
     
-    return PostListResponse(
+    return ModelResponse(PostListResponse(
         posts=[PostResponse.model_validate(p) for p in posts],
-    )
+    ))
 
 
 @router.post("/{post_id}/like", response_model=MessageResponse)
@@ -102,6 +159,19 @@ async def unlike_post(
     return MessageResponse(message="Post unliked")
 
 
+@router.get("/{post_id}/likes", response_model=PostLikesResponse)
+async def get_likes(post_id: uuid.UUID, current_user: CurrentUser, db: DbSession) -> ModelResponse:
+    """Get all users who liked a post."""
+    repo = PostRepository(db)
+    service = PostService(repo)
+    
+    likers = await service.get_likers(post_id)
+    
+    return ModelResponse(PostLikesResponse(
+        likes=[PostAuthor.model_validate(u) for u in likers],
+    ))
+
+
 @router.post("/{post_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
 async def add_comment(
     post_id: uuid.UUID,
@@ -120,17 +190,28 @@ async def add_comment(
 
 
 @router.get("/{post_id}/comments", response_model=CommentsListResponse)
-async def get_comments(post_id: uuid.UUID, current_user: CurrentUser, db: DbSession) -> CommentsListResponse:
-    """Get all comments for a post."""
+async def get_comments(
+    post_id: uuid.UUID,
+    request: Request,
+    current_user: CurrentUser,
+    db: DbSession,
+) -> Response:
+    """Get all comments for a post. Supports `If-None-Match`."""
     comment_repo = CommentRepository(db)
     post_repo = PostRepository(db)
     service = CommentService(comment_repo, post_repo)
     
+    etag = await service.get_comments_etag(post_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     comments = await service.get_post_comments(post_id)
     
-    return CommentsListResponse(
+    response = ModelResponse(CommentsListResponse(
         comments=[CommentResponse.model_validate(c) for c in comments],
-    )
+    ))
+    set_etag(response, etag)
+    return response
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -148,6 +229,7 @@ async def delete_post(
     service = PostService(repo)
     
     await service.delete_post(post_id, current_user.id)
+    await post_publisher.discard(post_id)
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
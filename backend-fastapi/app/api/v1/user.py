@@ -1,8 +1,6 @@
 import uuid
-from io import BytesIO
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, BackgroundTasks
-from PIL import Image
-from app.api.deps import CurrentUser, DbSession
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Request, Response
+from app.api.deps import CurrentUser, DbSession, Storage
 from app.schemas.user import (
     UserSignUpRequest,
     UserEditProfileRequest,
@@ -13,7 +11,10 @@ from app.schemas.user import (
     MessageResponse,
 )
 from app.core.security import OAuth2Form
-from app.core.cloudinary import upload_image
+from app.core.images import image_processor
+from app.core.uploads import open_image_upload, upload_path
+from app.core.etag import etag_matches, set_etag, not_modified
+from app.core.serialization import ModelResponse, dump_json
 from app.repositories.user import UserRepository
 from app.services.user import UserService
 
@@ -56,19 +57,31 @@ async def logout() -> MessageResponse:
 
 
 @router.get("/{user_id}/profile", response_model=UserProfileResponse)
-async def get_profile(user_id: uuid.UUID, db: DbSession, current_user: CurrentUser) -> UserProfileResponse:
-    """Get user profile by ID."""
+async def get_profile(
+    user_id: uuid.UUID,
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+) -> Response:
+    """Get user profile by ID. Supports `If-None-Match`."""
     repo = UserRepository(db)
     service = UserService(repo)
     
+    etag = await service.get_profile_etag(user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     user = await service.get_profile(user_id)
-    return UserProfileResponse.model_validate(user)
+    response = ModelResponse(UserProfileResponse.model_validate(user))
+    set_etag(response, etag)
+    return response
 
 
 @router.patch("/profile", response_model=UserResponse)
 async def edit_profile(
     current_user: CurrentUser,
     db: DbSession,
+    storage: Storage,
     bio: str | None = Form(None),
     gender: str | None = Form(None),
     profile_picture: UploadFile | None = File(None),
@@ -83,16 +96,13 @@ async def edit_profile(
     
     image_url = None
     if profile_picture:
-        content = await profile_picture.read()
-        img = Image.open(BytesIO(content))
-        img.thumbnail((800, 800))
-        buffer = BytesIO()
-        img.save(buffer, format="JPEG", quality=80)
-        buffer.seek(0)
-        image_url = await upload_image(buffer.getvalue())
+        upload = await open_image_upload(profile_picture)
+        async with upload_path(upload) as path:
+            processed = await image_processor.process(path)
+        image_url = await storage.save(f"bitmitra/{uuid.uuid4()}.jpg", processed.data)
     
     user = await service.update_profile(
-        user=current_user,
+        user_id=current_user.id,
         bio=bio,
         gender=gender,
         profile_picture=image_url,
@@ -102,13 +112,13 @@ async def edit_profile(
 
 
 @router.get("/suggested", response_model=list[UserBasicResponse])
-async def get_suggested_users(current_user: CurrentUser, db: DbSession) -> list[UserBasicResponse]:
-    """Get suggested users."""
+async def get_suggested_users(current_user: CurrentUser, db: DbSession) -> ModelResponse:
+    """Get users to follow, ranked by mutual follows."""
     repo = UserRepository(db)
     service = UserService(repo)
     
     users = await service.get_suggested_users(current_user.id)
-    return [UserBasicResponse.model_validate(u) for u in users]
+    return ModelResponse(dump_json([UserBasicResponse.model_validate(u) for u in users]))
 
 
 @router.post("/{user_id}/follow", response_model=MessageResponse)
@@ -0,0 +1,42 @@
+"""
+One-off backfill of data introduced by schema changes.
+
+Databases created before a change have the new columns at their defaults
+(`create_all` adds no columns, so add those by hand first). Every step
+only touches rows that are out of date, so running it again is harmless.
+
+    python -m app.backfill
+"""
+import asyncio
+import logging
+from app.database import async_session_maker, init_db
+from app.repositories.conversation import ConversationRepository
+from app.repositories.post import PostRepository
+from app.repositories.user import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill() -> None:
+    """Run every step, each in its own transaction."""
+    await init_db()
+    
+    async with async_session_maker() as session:
+        posts = await PostRepository(session).recount_engagement()
+        await session.commit()
+    logger.info("Recounted likes and comments of %d posts", posts)
+    
+    async with async_session_maker() as session:
+        users = await UserRepository(session).recount_followers()
+        await session.commit()
+    logger.info("Recounted followers of %d users", users)
+    
+    async with async_session_maker() as session:
+        conversations = await ConversationRepository(session).backfill_direct_pairs()
+        await session.commit()
+    logger.info("Paired or merged %d direct conversations", conversations)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill())
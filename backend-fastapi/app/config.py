@@ -13,11 +13,107 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expiration_days: int = 1
     
+    # Max concurrent Argon2 hash/verify calls per process (each uses ~64 MiB)
+    password_hash_concurrency: int = 2
+    
+    # Authenticated principal cache (per process)
+    principal_cache_size: int = 10_000
+    principal_cache_ttl_seconds: float = 60.0
+    
+    # Uploads
+    upload_max_bytes: int = 25 * 1024 * 1024
+    image_max_pixels: int = 50_000_000
+    
+    # Image processing
+    image_max_dimension: int = 800
+    image_jpeg_quality: int = 80
+    image_executor: str = "process"  # "process" or "thread"
+    image_workers: int = 2
+    image_process_timeout_seconds: float = 10.0
+    # Post image derivatives; each width is encoded in each format
+    image_variant_widths: list[int] = [320, 640, 1080]
+    image_variant_formats: list[str] = ["avif", "webp", "jpeg"]
+    
+    # Post publishing: "deferred" returns as soon as the upload is staged and
+    # publishes the image in the background; "inline" does it in the request
+    post_publish_mode: str = "deferred"
+    post_publish_staging_dir: str = "staging"
+    post_publish_workers: int = 2
+    post_publish_max_attempts: int = 3
+    post_publish_retry_base_seconds: float = 2.0
+    # A worker process owns a processing post for this long per attempt;
+    # expired leases (e.g. of a crashed process) are taken over by others
+    post_publish_lease_seconds: float = 120.0
+    
+    # Storage
+    storage_backend: str = "cloudinary"  # "cloudinary" or "local"
+    storage_upload_concurrency: int = 8
+    media_root: str = "media"
+    media_url: str = "/media"
+    media_cache_max_age: int = 31_536_000
+    
     # Cloudinary
     cloud_name: str = ""
     api_key: str = ""
     api_secret: str = ""
     
+    # Feed
+    comment_preview_count: int = 3
+    # Serialized global feed pages: "memory" (per worker) or "sqlite" (a
+    # local file shared by the workers on one host, needed with more than
+    # one worker so invalidations reach them all)
+    feed_cache_backend: str = "memory"
+    feed_cache_path: str = "feed_cache.sqlite3"
+    feed_cache_max_pages: int = 1_000
+    feed_cache_ttl_seconds: float = 300.0
+    
+    # Home timeline
+    # Authors with at least this many followers are not fanned out on write;
+    # their posts are merged into followers' timelines at read time instead.
+    timeline_fanout_threshold: int = 10_000
+    timeline_backfill_limit: int = 50
+    
+    # Suggested users (friends of friends, from an in-memory follow graph)
+    suggestion_limit: int = 20
+    # Most-followed accounts kept to fill in when a user's network is small
+    suggestion_popular_pool: int = 1_000
+    # The graph is reloaded this often, or once this many follows and
+    # unfollows have been applied on top of it
+    suggestion_refresh_seconds: float = 600.0
+    suggestion_overlay_max_edges: int = 50_000
+    
+    # WebSocket delivery
+    ws_send_queue_size: int = 256
+    ws_send_timeout_seconds: float = 10.0
+    # Clients answer each `ping` event with a "pong" frame; a socket that
+    # sends nothing for the idle timeout is closed
+    ws_heartbeat_interval_seconds: float = 25.0
+    ws_idle_timeout_seconds: float = 60.0
+    # Presence changes are batched per window; a reconnect within the window
+    # produces no offline/online events
+    presence_coalesce_seconds: float = 1.0
+    presence_audience_cache_size: int = 10_000
+    presence_audience_ttl_seconds: float = 60.0
+    # Notification events for the same (recipient, post, type) within this
+    # window are stored and pushed as one aggregated notification
+    notification_window_seconds: float = 2.0
+    # WebSocket chat sends are written in batches of up to this many
+    chat_batch_max_size: int = 200
+    chat_batch_linger_seconds: float = 0.002
+    # Sends beyond these limits are rejected with `message_error`
+    chat_queue_max_size: int = 10_000
+    chat_max_inflight_per_connection: int = 32
+    # "memory" for a single worker; "broker" to share events and presence
+    # across workers via `python -m app.websocket.broker`
+    realtime_backplane: str = "memory"
+    realtime_broker_host: str = "127.0.0.1"
+    realtime_broker_port: int = 8765
+    # Frames the broker buffers per worker before disconnecting a slow one
+    realtime_broker_queue_size: int = 10_000
+    # Replay log for reconnecting clients (kept by the broker when used)
+    realtime_log_max_events: int = 256
+    realtime_log_max_users: int = 50_000
+    
     # CORS
     frontend_url: str = "http://localhost:5173"
     
@@ -0,0 +1,68 @@
+"""In-process caches."""
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded LRU cache whose entries also expire after a TTL.
+    
+    Each entry may carry its own earlier deadline (e.g. a token's `exp`).
+    Not thread-safe - intended to be used from the event loop only.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at as a time.time() timestamp, value)
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+    
+    def get(self, key: K) -> V | None:
+        """Get a live entry, counting the hit or miss."""
+        entry = self._entries.get(key)
+        
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key: K, value: V, expires_at: float | None = None) -> None:
+        """Store an entry until `expires_at` or the TTL, whichever is sooner."""
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        
+        self._entries[key] = (deadline, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, key: K) -> None:
+        """Drop an entry if present."""
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
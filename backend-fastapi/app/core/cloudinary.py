@@ -1,6 +1,7 @@
 import cloudinary
 import cloudinary.uploader
 from app.config import get_settings
+from app.core.executor import BoundedExecutor
 
 settings = get_settings()
 
@@ -11,21 +12,34 @@ cloudinary.config(
     api_secret=settings.api_secret,
 )
 
+# The SDK is synchronous, so uploads run on a bounded thread pool
+upload_executor = BoundedExecutor("cloudinary", settings.storage_upload_concurrency)
 
-async def upload_image(file_content: bytes, folder: str = "bitmitra") -> str:
+
+async def upload_image(
+    file_content: bytes,
+    folder: str = "bitmitra",
+    public_id: str | None = None,
+    format: str | None = None,
+) -> str:
     """
     Upload image to Cloudinary.
     
     Args:
         file_content: Image bytes
         folder: Cloudinary folder name
-        
+        public_id: Optional asset name; Cloudinary generates one if omitted
+        format: Optional delivery format, e.g. "webp"
+    
     Returns:
         Secure URL of uploaded image
     """
-    result = cloudinary.uploader.upload(
+    result = await upload_executor.run(
+        cloudinary.uploader.upload,
         file_content,
         folder=folder,
+        public_id=public_id,
+        format=format,
         resource_type="image",
     )
     return result.get("secure_url", "")
@@ -38,11 +52,12 @@ async def upload_image_from_base64(base64_data: str, folder: str = "bitmitra") -
     Args:
         base64_data: Base64 encoded image data
         folder: Cloudinary folder name
-        
+    
     Returns:
         Secure URL of uploaded image
     """
-    result = cloudinary.uploader.upload(
+    result = await upload_executor.run(
+        cloudinary.uploader.upload,
         base64_data,
         folder=folder,
         resource_type="image",
@@ -0,0 +1,43 @@
+"""
+Weak ETags for conditional GETs.
+
+ETags are built from cheap version stamps (revision columns, page keys)
+read without loading the payload, so an unchanged resource is answered
+with a bodiless 304 after a single small query.
+"""
+import hashlib
+from fastapi import Request, Response, status
+
+# Clients may keep responses but must revalidate them before each reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    """Build a weak ETag from version stamps such as IDs and revisions."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's `If-None-Match` against an ETag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach an ETag and the revalidation policy to a response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    """Build a 304 Not Modified response for an ETag."""
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_etag(response, etag)
+    return response
@@ -0,0 +1,111 @@
+"""Bounded executors for running blocking work from async code."""
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import BrokenExecutor, Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """
+    Runs blocking callables in a pool, off the event loop.
+    
+    At most `max_concurrency` calls are in flight; further callers wait
+    on a semaphore, so a burst only slows callers of this executor. The
+    `queued` counter is the current wait-queue depth.
+    
+    A slot is held until the pool job itself finishes: a caller that is
+    cancelled (e.g. by a timeout) can't stop a running job, so its slot
+    stays taken until the job is done.
+    
+    A pool that breaks (e.g. a process worker was killed) is discarded
+    and the next call creates a new one; the failing calls raise
+    `BrokenExecutor`.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        executor_factory: Callable[[int], Executor] | None = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._executor_factory = executor_factory or (
+            lambda workers: ThreadPoolExecutor(workers, thread_name_prefix=name)
+        )
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+    
+    @property
+    def executor(self) -> Executor:
+        """The underlying pool, created on first use."""
+        if self._executor is None:
+            self._executor = self._executor_factory(self.max_concurrency)
+        return self._executor
+    
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `fn(*args, **kwargs)` in the pool once a slot is free."""
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        
+        executor = self.executor
+        try:
+            job = executor.submit(partial(fn, *args, **kwargs))
+        except BaseException as exc:
+            self._semaphore.release()
+            if isinstance(exc, BrokenExecutor):
+                self._discard(executor)
+            raise
+        
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        job.add_done_callback(lambda _: self._call_soon(loop, self._release))
+        try:
+            # Cancelling the wrapper only cancels a job that hasn't started
+            return await asyncio.wrap_future(job)
+        except BrokenExecutor:
+            self._discard(executor)
+            raise
+    
+    def _discard(self, executor: Executor) -> None:
+        # Concurrent failures may already have replaced it
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _release(self) -> None:
+        self.running -= 1
+        self.completed += 1
+        self._semaphore.release()
+    
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]) -> None:
+        # Jobs finish on pool threads; the semaphore belongs to the loop
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # Loop already closed
+    
+    def shutdown(self) -> None:
+        """Stop the pool (it is recreated if used again)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+        }
@@ -0,0 +1,285 @@
+"""
+Image processing pipeline for uploads.
+
+Decoding and re-encoding run on a process pool so a large upload never
+blocks the event loop.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from fastapi import HTTPException, status
+from PIL import Image, UnidentifiedImageError, features
+from app.config import get_settings
+from app.core.executor import BoundedExecutor
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Applies in pool workers too, since they import this module. Pillow raises
+# DecompressionBombError beyond twice this many pixels.
+Image.MAX_IMAGE_PIXELS = settings.image_max_pixels
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessedImage:
+    """Result of the pipeline: encoded bytes plus per-stage timings (ms)."""
+    data: bytes
+    width: int
+    height: int
+    timings: dict[str, float]
+
+
+def process_image(path: Path, max_size: tuple[int, int], quality: int) -> ProcessedImage:
+    """
+    Decode, downscale and re-encode an image as JPEG.
+    
+    Runs inside a pool worker, so it must stay a picklable module-level
+    function with no event-loop or database dependencies.
+    """
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+    
+    def mark(stage: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = (now - started) * 1000
+        started = now
+    
+    img = Image.open(path)
+    # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, so full-resolution
+    # pixels are never materialized when only `max_size` is needed
+    img.draft("RGB", max_size)
+    img.load()
+    mark("decode")
+    
+    img.thumbnail(max_size)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    mark("resize")
+    
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    mark("encode")
+    
+    return ProcessedImage(buffer.getvalue(), img.width, img.height, timings)
+
+
+@dataclass(frozen=True, slots=True)
+class ImageVariant:
+    """One encoded derivative of an upload."""
+    format: str
+    width: int
+    height: int
+    data: bytes
+    
+    @property
+    def content_type(self) -> str:
+        return f"image/{self.format}"
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessedVariants:
+    """All derivatives of an upload plus per-stage timings (ms)."""
+    variants: list[ImageVariant]
+    timings: dict[str, float]
+
+
+# Pillow format name and save options per variant format
+VARIANT_ENCODERS: dict[str, tuple[str, dict]] = {
+    "avif": ("AVIF", {"quality": 55, "speed": 8}),
+    "webp": ("WEBP", {"quality": 75, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+# `PIL.features` name of the codec behind each variant format
+VARIANT_FEATURES = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+
+def supported_variant_formats(formats: list[str]) -> list[str]:
+    """
+    Drop formats this Pillow build can't encode (AVIF needs Pillow 11.3+
+    built with libavif), falling back to JPEG if none are left.
+    """
+    supported = []
+    for fmt in formats:
+        if fmt in VARIANT_ENCODERS and features.check(VARIANT_FEATURES[fmt]):
+            supported.append(fmt)
+        else:
+            logger.warning("Image variant format %r is not supported by this Pillow build, skipping it", fmt)
+    return supported or ["jpeg"]
+
+
+def generate_variants(path: Path, widths: list[int], formats: list[str]) -> ProcessedVariants:
+    """
+    Decode an image once and encode it at each width in each format.
+    
+    Widths larger than the source are clamped to the source width, so a
+    small upload yields fewer variants and is never upscaled. Like
+    `process_image`, this runs inside a pool worker.
+    """
+    timings = {"decode": 0.0, "resize": 0.0, "encode": 0.0}
+    started = time.perf_counter()
+    
+    def mark(stage: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] += (now - started) * 1000
+        started = now
+    
+    img = Image.open(path)
+    largest = max(widths)
+    img.draft("RGB", (largest, largest * img.height // img.width))
+    img.load()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    mark("decode")
+    
+    variants = []
+    # Largest first, each resized from the previous one to keep resampling cheap
+    for width in sorted({min(w, img.width) for w in widths}, reverse=True):
+        height = max(1, round(img.height * width / img.width))
+        if width != img.width:
+            img = img.resize((width, height), Image.Resampling.LANCZOS)
+        mark("resize")
+        
+        for fmt in formats:
+            pil_format, options = VARIANT_ENCODERS[fmt]
+            buffer = BytesIO()
+            img.save(buffer, format=pil_format, **options)
+            variants.append(ImageVariant(fmt, width, height, buffer.getvalue()))
+        mark("encode")
+    
+    return ProcessedVariants(variants, timings)
+
+
+class ImageProcessor:
+    """
+    Async front end of the pipeline.
+    
+    Runs `process_image` on a bounded executor with a timeout and keeps
+    running totals of per-stage timings.
+    """
+    
+    def __init__(
+        self,
+        executor: BoundedExecutor,
+        max_size: tuple[int, int],
+        quality: int,
+        timeout: float,
+    ):
+        self.executor = executor
+        self.max_size = max_size
+        self.quality = quality
+        self.timeout = timeout
+        self.variant_formats = supported_variant_formats(settings.image_variant_formats)
+        self.processed = 0
+        self.failed = 0
+        self._stage_totals: dict[str, float] = {}
+    
+    async def process(self, path: Path) -> ProcessedImage:
+        """
+        Downscale an uploaded image file to a single JPEG.
+        
+        Raises:
+            HTTPException: If the image is invalid or processing timed out
+        """
+        return await self._run(process_image, path, self.max_size, self.quality)
+    
+    async def generate_variants(self, path: Path) -> ProcessedVariants:
+        """
+        Encode an uploaded image file at the configured widths and formats.
+        
+        Raises:
+            HTTPException: If the image is invalid or processing timed out
+        """
+        return await self._run(
+            generate_variants,
+            path,
+            settings.image_variant_widths,
+            self.variant_formats,
+        )
+    
+    async def _run(self, fn, *args):
+        """Run a pipeline function on the pool, mapping failures to HTTP errors."""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.executor.run(fn, *args), self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing timed out",
+            )
+        except BrokenExecutor:
+            # A worker died (e.g. killed on memory); the pool is replaced
+            self.failed += 1
+            logger.warning("Image worker pool broke, restarting it")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing unavailable, try again",
+            )
+        except Image.DecompressionBombError:
+            self.failed += 1
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Image dimensions too large",
+            )
+        except (UnidentifiedImageError, OSError, ValueError):
+            self.failed += 1
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid image",
+            )
+        
+        timings = {**result.timings, "total": (time.perf_counter() - started) * 1000}
+        for stage, elapsed in timings.items():
+            self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + elapsed
+        self.processed += 1
+        logger.debug("%s finished in %s", fn.__name__, timings)
+        
+        return result
+    
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        self.executor.shutdown()
+    
+    def stats(self) -> dict:
+        """Counters and average per-stage timings for monitoring."""
+        return {
+            **self.executor.stats(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_stage_ms": {
+                stage: round(total / self.processed, 2)
+                for stage, total in self._stage_totals.items()
+            } if self.processed else {},
+        }
+
+
+def _create_executor() -> BoundedExecutor:
+    """Process pool by default; a thread pool avoids extra processes in development."""
+    if settings.image_executor == "thread":
+        return BoundedExecutor("images", settings.image_workers)
+    
+    # Spawn rather than fork: forking a process that runs an event loop
+    # and holds DB connections is unsafe
+    context = multiprocessing.get_context("spawn")
+    return BoundedExecutor(
+        "images",
+        settings.image_workers,
+        lambda workers: ProcessPoolExecutor(workers, mp_context=context),
+    )
+
+
+# Singleton instance
+image_processor = ImageProcessor(
+    _create_executor(),
+    max_size=(settings.image_max_dimension, settings.image_max_dimension),
+    quality=settings.image_jpeg_quality,
+    timeout=settings.image_process_timeout_seconds,
+)
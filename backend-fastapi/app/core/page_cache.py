@@ -0,0 +1,436 @@
+"""
+Cache of pre-serialized response pages.
+
+Pages are stored as JSON bytes with their ETag and indexed by the posts
+they contain, so a write drops only the pages showing the affected posts
+(or, for a new post, the head pages). Invalidations are applied after the
+writing transaction commits.
+
+- `MemoryPageStore`: per process; use with a single worker.
+- `SQLitePageStore`: a local SQLite file shared by all workers on a host.
+  Its calls block, so they run in order on a dedicated thread.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import NamedTuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# session.info key for invalidations waiting for the commit
+PENDING_KEY = "page_cache_invalidations"
+
+
+class CachedPage(NamedTuple):
+    """A serialized response body and its ETag."""
+    etag: str
+    body: bytes
+
+
+# Returns the page and the IDs of the posts on it
+PageBuilder = Callable[[], Awaitable[tuple[CachedPage, list[uuid.UUID]]]]
+
+
+class PageStore(ABC):
+    """Storage for cached pages with a post -> pages reverse index."""
+    
+    # Whether calls do blocking I/O and must stay off the event loop
+    blocking = False
+    
+    @abstractmethod
+    def get(self, key: str) -> CachedPage | None:
+        """Get a live page."""
+    
+    @abstractmethod
+    def set(self, key: str, page: CachedPage, post_ids: list[uuid.UUID], head: bool, since: float) -> bool:
+        """
+        Store a page built from data read after `since`.
+        
+        Returns:
+            bool: False (nothing stored) if any of its posts, or the head
+            pages for a head page, were invalidated after `since`, or all
+            pages were cleared after it
+        """
+    
+    @abstractmethod
+    def invalidate(self, post_ids: Iterable[uuid.UUID], head: bool = False) -> None:
+        """Drop the pages showing any of the posts, and the head pages if `head`."""
+    
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all pages, including ones being built now."""
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {}
+
+
+class MemoryPageStore(PageStore):
+    """Bounded LRU page store in this process."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, page, post IDs), least recently used first
+        self._pages: OrderedDict[str, tuple[float, CachedPage, list[uuid.UUID]]] = OrderedDict()
+        self._by_post: dict[uuid.UUID, set[str]] = {}
+        self._head: set[str] = set()
+        # Recent invalidation times, oldest first; kept for one TTL, which
+        # is far longer than building a page takes
+        self._invalidated: OrderedDict[uuid.UUID, float] = OrderedDict()
+        self._head_invalidated = 0.0
+        self._cleared = 0.0
+    
+    def get(self, key: str) -> CachedPage | None:
+        entry = self._pages.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            self._drop(key)
+            return None
+        
+        self._pages.move_to_end(key)
+        return entry[1]
+    
+    def set(self, key: str, page: CachedPage, post_ids: list[uuid.UUID], head: bool, since: float) -> bool:
+        if self._cleared > since or (head and self._head_invalidated > since):
+            return False
+        if any(self._invalidated.get(post_id, 0.0) > since for post_id in post_ids):
+            return False
+        
+        self._drop(key)
+        self._pages[key] = (time.time() + self.ttl, page, post_ids)
+        for post_id in post_ids:
+            self._by_post.setdefault(post_id, set()).add(key)
+        if head:
+            self._head.add(key)
+        
+        while len(self._pages) > self.maxsize:
+            self._drop(next(iter(self._pages)))
+        return True
+    
+    def invalidate(self, post_ids: Iterable[uuid.UUID], head: bool = False) -> None:
+        now = time.time()
+        for post_id in post_ids:
+            self._invalidated[post_id] = now
+            self._invalidated.move_to_end(post_id)
+            for key in list(self._by_post.get(post_id, ())):
+                self._drop(key)
+        
+        if head:
+            self._head_invalidated = now
+            for key in list(self._head):
+                self._drop(key)
+        
+        while self._invalidated and next(iter(self._invalidated.values())) < now - self.ttl:
+            self._invalidated.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._cleared = time.time()
+        self._pages.clear()
+        self._by_post.clear()
+        self._head.clear()
+    
+    def stats(self) -> dict:
+        return {"pages": len(self._pages), "maxsize": self.maxsize}
+    
+    def _drop(self, key: str) -> None:
+        """Remove a page and its reverse index entries."""
+        entry = self._pages.pop(key, None)
+        if entry is None:
+            return
+        
+        for post_id in entry[2]:
+            if keys := self._by_post.get(post_id):
+                keys.discard(key)
+                if not keys:
+                    del self._by_post[post_id]
+        self._head.discard(key)
+
+
+class SQLitePageStore(PageStore):
+    """
+    Page store in a local SQLite file, shared by the workers on one host.
+    
+    Writers from different workers wait on each other for up to the busy
+    timeout, so `PageCache` runs these calls on its own thread.
+    """
+    
+    blocking = True
+    
+    # Invalidation rows for the head pages and for all pages
+    HEAD = "head"
+    ALL = "all"
+    
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                body BLOB NOT NULL,
+                head INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS page_posts (
+                post_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (post_id, key)
+            );
+            CREATE INDEX IF NOT EXISTS ix_page_posts_key ON page_posts (key);
+            CREATE TABLE IF NOT EXISTS invalidations (
+                target TEXT PRIMARY KEY,
+                at REAL NOT NULL
+            );
+            """
+        )
+    
+    def get(self, key: str) -> CachedPage | None:
+        row = self._db.execute(
+            "SELECT etag, body FROM pages WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return CachedPage(row[0], bytes(row[1])) if row else None
+    
+    def set(self, key: str, page: CachedPage, post_ids: list[uuid.UUID], head: bool, since: float) -> bool:
+        targets = [str(post_id) for post_id in post_ids] + ([self.HEAD] if head else []) + [self.ALL]
+        
+        with self._transaction() as db:
+            if targets:
+                placeholders = ",".join("?" * len(targets))
+                stale = db.execute(
+                    f"SELECT 1 FROM invalidations WHERE target IN ({placeholders}) AND at > ? LIMIT 1",
+                    (*targets, since),
+                ).fetchone()
+                if stale:
+                    return False
+            
+            self._delete_pages(db, [key])
+            db.execute(
+                "INSERT INTO pages (key, etag, body, head, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, page.etag, page.body, int(head), time.time() + self.ttl),
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO page_posts (post_id, key) VALUES (?, ?)",
+                [(str(post_id), key) for post_id in post_ids],
+            )
+        return True
+    
+    def invalidate(self, post_ids: Iterable[uuid.UUID], head: bool = False) -> None:
+        targets = [str(post_id) for post_id in post_ids]
+        if not targets and not head:
+            return
+        
+        now = time.time()
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO invalidations (target, at) VALUES (?, ?)",
+                [(target, now) for target in targets + ([self.HEAD] if head else [])],
+            )
+            
+            keys = []
+            if targets:
+                placeholders = ",".join("?" * len(targets))
+                keys += [row[0] for row in db.execute(
+                    f"SELECT key FROM page_posts WHERE post_id IN ({placeholders})", targets
+                )]
+            if head:
+                keys += [row[0] for row in db.execute("SELECT key FROM pages WHERE head = 1")]
+            self._delete_pages(db, keys)
+            
+            # Housekeeping on the write path: expired pages and old invalidations
+            expired = [row[0] for row in db.execute("SELECT key FROM pages WHERE expires_at <= ?", (now,))]
+            self._delete_pages(db, expired)
+            db.execute("DELETE FROM invalidations WHERE at < ?", (now - self.ttl,))
+    
+    def clear(self) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO invalidations (target, at) VALUES (?, ?)",
+                (self.ALL, time.time()),
+            )
+            db.execute("DELETE FROM pages")
+            db.execute("DELETE FROM page_posts")
+    
+    def stats(self) -> dict:
+        return {"pages": self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]}
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction, taking the lock up front so checks and writes are atomic."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+    
+    @staticmethod
+    def _delete_pages(db: sqlite3.Connection, keys: list[str]) -> None:
+        if not keys:
+            return
+        db.executemany("DELETE FROM pages WHERE key = ?", [(key,) for key in keys])
+        db.executemany("DELETE FROM page_posts WHERE key = ?", [(key,) for key in keys])
+
+
+class PageCache:
+    """
+    Page cache with single-flight rebuilds.
+    
+    Concurrent misses on one key in this process share a single build.
+    Store errors are logged and treated as misses, never failing a request.
+    
+    Calls to a blocking store go, in order, to a single thread: an
+    invalidation queued at commit is applied before any read this process
+    makes afterwards.
+    """
+    
+    def __init__(self, store: PageStore):
+        self.store = store
+        self._thread = ThreadPoolExecutor(1, thread_name_prefix="page-cache") if store.blocking else None
+        self._inflight: dict[str, asyncio.Future[CachedPage]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+    
+    async def get_or_build(self, key: str, build: PageBuilder, head: bool = False) -> CachedPage:
+        """
+        Get a cached page, building and storing it on a miss.
+        
+        `head` marks pages that a new post would appear on.
+        """
+        while True:
+            if page := await self._get(key):
+                self.hits += 1
+                return page
+            
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only retry if the build was abandoned, not if we were cancelled
+                if not future.cancelled():
+                    raise
+        
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            since = time.time()
+            page, post_ids = await build()
+            try:
+                await self._call(self.store.set, key, page, post_ids, head, since)
+            except Exception:
+                logger.exception("Failed to cache page %s", key)
+            future.set_result(page)
+            return page
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Waiters (if any) re-raise it; don't report it as unretrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+    
+    def invalidate_on_commit(
+        self,
+        session: AsyncSession,
+        post_ids: Iterable[uuid.UUID] = (),
+        head: bool = False,
+    ) -> None:
+        """Invalidate pages once the session's transaction commits."""
+        session.info.setdefault(PENDING_KEY, []).append((self, list(post_ids), head, False))
+    
+    def clear_on_commit(self, session: AsyncSession) -> None:
+        """Drop all pages once the session's transaction commits."""
+        session.info.setdefault(PENDING_KEY, []).append((self, [], False, True))
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            **self.store.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+        }
+    
+    async def _get(self, key: str) -> CachedPage | None:
+        try:
+            return await self._call(self.store.get, key)
+        except Exception:
+            logger.exception("Failed to read cached page %s", key)
+            return None
+    
+    async def _call(self, fn, *args):
+        if self._thread is None:
+            return fn(*args)
+        return await asyncio.wrap_future(self._thread.submit(fn, *args))
+    
+    def _apply(self, post_ids: list[uuid.UUID], head: bool, clear: bool) -> None:
+        self.invalidations += 1
+        if self._thread is None:
+            self._invalidate(post_ids, head, clear)
+        else:
+            # Called from a sync commit hook; queued without waiting
+            self._thread.submit(self._invalidate, post_ids, head, clear)
+    
+    def _invalidate(self, post_ids: list[uuid.UUID], head: bool, clear: bool) -> None:
+        try:
+            if clear:
+                self.store.clear()
+            else:
+                self.store.invalidate(post_ids, head)
+        except Exception:
+            logger.exception("Failed to invalidate cached pages")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    # Applied after the commit so a concurrent rebuild can't re-cache old data
+    for cache, post_ids, head, clear in session.info.pop(PENDING_KEY, ()):
+        cache._apply(post_ids, head, clear)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def create_page_store() -> PageStore:
+    """Create the configured page store."""
+    if settings.feed_cache_backend == "sqlite":
+        return SQLitePageStore(settings.feed_cache_path, settings.feed_cache_ttl_seconds)
+    if settings.realtime_backplane == "broker":
+        raise ValueError("FEED_CACHE_BACKEND=sqlite is required with REALTIME_BACKPLANE=broker")
+    return MemoryPageStore(settings.feed_cache_max_pages, settings.feed_cache_ttl_seconds)
+
+
+# Singleton instance for global feed pages
+feed_cache = PageCache(create_page_store())
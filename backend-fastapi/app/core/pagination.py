@@ -0,0 +1,30 @@
+"""Opaque keyset cursors for paginated endpoints."""
+import base64
+import binascii
+import uuid
+from datetime import datetime
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime, item_id: uuid.UUID) -> str:
+    """Encode a `(created_at, id)` sort key as an opaque URL-safe cursor."""
+    raw = f"{created_at.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(item_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
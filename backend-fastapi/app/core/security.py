@@ -1,4 +1,5 @@
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 import jwt
@@ -7,26 +8,78 @@ from pwdlib.hashers.argon2 import Argon2Hasher
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
 from app.config import get_settings
+from app.core.cache import TTLCache
+from app.core.executor import BoundedExecutor
 
 settings = get_settings()
 
 # Password hasher using Argon2
 password_hasher = PasswordHash((Argon2Hasher(),))
 
+# Argon2 is deliberately CPU- and memory-heavy; run it on a small capped
+# thread pool (argon2-cffi releases the GIL) instead of the event loop
+password_executor = BoundedExecutor("argon2", settings.password_hash_concurrency)
+
 # OAuth2 scheme - FastAPI's built-in security
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/user/login")
 
 
-def hash_password(password: str) -> str:
-    """Hash a password using Argon2."""
-    return password_hasher.hash(password)
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    The authenticated caller - identity and display fields only.
+    
+    Loaded without touching any relationship; handlers that need the full
+    User (or its collections) must load it explicitly.
+    """
+    id: uuid.UUID
+    user_name: str
+    profile_picture: str = ""
+
+
+# session.info key for principals to invalidate on commit
+PENDING_KEY = "principal_invalidations"
 
+# Resolved principals by user ID. Per process: other workers only see a
+# change once their entry expires, so keep the TTL short.
+principal_cache: TTLCache[uuid.UUID, Principal] = TTLCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds,
+)
+
+
+def invalidate_principal_on_commit(session: AsyncSession, user_id: uuid.UUID) -> None:
+    """
+    Forget a cached principal once the session's change to the user commits.
+    
+    Invalidating any earlier would let a concurrent request re-cache the
+    old row before the commit, for the full TTL.
+    """
+    session.info.setdefault(PENDING_KEY, set()).add(user_id)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
-    return password_hasher.verify(plain_password, hashed_password)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_pending(session: Session) -> None:
+    for user_id in session.info.pop(PENDING_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password using Argon2, off the event loop."""
+    return await password_executor.run(password_hasher.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash, off the event loop."""
+    return await password_executor.run(password_hasher.verify, plain_password, hashed_password)
 
 
 def create_access_token(user_id: uuid.UUID) -> str:
@@ -58,10 +111,14 @@ def decode_access_token(token: str) -> dict | None:
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: AsyncSession,
-) -> "User":
+) -> Principal:
     """
     Dependency to get the current authenticated user from Bearer token.
     Uses OAuth2PasswordBearer - the FastAPI standard.
+    
+    Only the principal's columns are selected, no ORM entity is built,
+    and resolved principals are cached until the token expires (or
+    `principal_cache_ttl_seconds`, if sooner).
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -82,14 +139,21 @@ async def get_current_user(
     except ValueError:
         raise credentials_exception
     
+    if principal := principal_cache.get(user_uuid):
+        return principal
+    
     from app.models.user import User
-    result = await db.execute(select(User).where(User.id == user_uuid))
-    user = result.scalar_one_or_none()
+    result = await db.execute(
+        select(User.id, User.user_name, User.profile_picture).where(User.id == user_uuid)
+    )
+    row = result.one_or_none()
     
-    if not user:
+    if not row:
         raise credentials_exception
     
-    return user
+    principal = Principal(id=row.id, user_name=row.user_name, profile_picture=row.profile_picture or "")
+    principal_cache.set(user_uuid, principal, expires_at=payload.get("exp"))
+    return principal
 
 
 # Type alias for OAuth2 form data (FastAPI standard for login)
@@ -0,0 +1,42 @@
+"""
+Fast JSON serialization for responses and WebSocket events.
+
+Models are validated once and dumped straight to bytes by pydantic-core;
+the bytes can then be embedded in larger payloads (an HTTP body and a
+WebSocket envelope, say) without being decoded or encoded again.
+"""
+from typing import Any
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def dump_json(value: BaseModel | Any) -> bytes:
+    """Serialize a model (or plain JSON-able data) to JSON bytes."""
+    return to_json(value)
+
+
+def embed_json(data: bytes, key: str, **fields: Any) -> bytes:
+    """
+    Build a JSON object of `fields` plus pre-serialized `data` under `key`,
+    e.g. `embed_json(message, "data", event="new_message")`.
+    """
+    head = to_json(fields)[:-1]
+    if fields:
+        head += b","
+    return head + to_json(key) + b":" + data + b"}"
+
+
+class ModelResponse(Response):
+    """
+    JSON response rendered directly from a validated model or JSON bytes.
+    
+    Returning one from an endpoint skips FastAPI's re-validation against
+    `response_model` (which is still used for the OpenAPI schema).
+    """
+    media_type = "application/json"
+    
+    def render(self, content: BaseModel | bytes) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
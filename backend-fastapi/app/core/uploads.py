@@ -0,0 +1,132 @@
+"""
+Upload ingestion.
+
+Starlette already spools multipart uploads (in memory up to 1 MiB, then
+to disk). Uploads are checked in place against a hard byte cap and their
+image headers are validated before anything is decoded; the spooled file
+is then handed on, never read into memory whole.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import warnings
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import BinaryIO
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, UnidentifiedImageError
+from app.config import get_settings
+
+settings = get_settings()
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def check_upload_size(upload: UploadFile, max_bytes: int) -> None:
+    """
+    Reject an upload larger than `max_bytes`.
+    
+    Uses the size recorded by the multipart parser; otherwise the spooled
+    file is streamed through in chunks, stopping as soon as it exceeds the
+    cap, without keeping any of it.
+    
+    Raises:
+        HTTPException: If the upload is larger than `max_bytes`
+    """
+    if upload.size is not None:
+        if upload.size > max_bytes:
+            raise _too_large()
+        return
+    
+    read = 0
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            read += len(chunk)
+            if read > max_bytes:
+                raise _too_large()
+    finally:
+        await upload.seek(0)
+
+
+def check_image_header(file, max_pixels: int) -> tuple[int, int]:
+    """
+    Read only the image header and validate its dimensions.
+    
+    `Image.open` is lazy, so no pixel data is decoded here.
+    
+    Returns:
+        tuple: Width and height
+    
+    Raises:
+        HTTPException: If the file is not an image or has too many pixels
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(file) as img:
+                width, height = img.size
+    except Image.DecompressionBombError:
+        raise _too_many_pixels()
+    except (UnidentifiedImageError, OSError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image",
+        )
+    finally:
+        file.seek(0)
+    
+    if width * height > max_pixels:
+        raise _too_many_pixels()
+    
+    return width, height
+
+
+async def open_image_upload(upload: UploadFile) -> BinaryIO:
+    """
+    Ingest an image upload with the configured byte and pixel limits.
+    
+    Returns:
+        BinaryIO: The upload's spooled file, rewound; it is closed with the
+        request
+    """
+    await check_upload_size(upload, settings.upload_max_bytes)
+    check_image_header(upload.file, settings.image_max_pixels)
+    return upload.file
+
+
+@asynccontextmanager
+async def upload_path(file: BinaryIO) -> AsyncIterator[Path]:
+    """
+    Copy an upload to a named temp file, removed on exit.
+    
+    Image pool workers run in other processes and open uploads by path.
+    """
+    fd, name = tempfile.mkstemp(prefix="upload-")
+    path = Path(name)
+    try:
+        await asyncio.to_thread(_copy_to_fd, file, fd)
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def _copy_to_fd(file: BinaryIO, fd: int) -> None:
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(file, out, CHUNK_SIZE)
+    file.seek(0)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Upload too large",
+    )
+
+
+def _too_many_pixels() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Image dimensions too large",
+    )
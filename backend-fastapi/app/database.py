@@ -1,3 +1,6 @@
+from sqlalchemy import ColumnElement, Insert, Table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import get_settings
@@ -23,6 +26,37 @@ class Base(DeclarativeBase):
     pass
 
 
+def insert_ignore(table: Table | type[Base]) -> Insert:
+    """
+    Build an `INSERT ... ON CONFLICT DO NOTHING` for the configured dialect.
+    
+    The statement's rowcount tells whether a row was actually written.
+    """
+    insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    return insert(table).on_conflict_do_nothing()
+
+
+def insert_or_update(
+    table: Table | type[Base],
+    key: list[str],
+    columns: list[str],
+    where: ColumnElement[bool] | None = None,
+) -> Insert:
+    """
+    Build an `INSERT ... ON CONFLICT (key) DO UPDATE` for the configured
+    dialect, taking `columns` from the new row on conflict.
+    
+    `where` names the predicate of a partial unique index on `key`.
+    """
+    insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=key,
+        index_where=where,
+        set_={column: statement.excluded[column] for column in columns},
+    )
+
+
 async def get_db() -> AsyncSession:
     """Dependency for getting async database session."""
     async with async_session_maker() as session:
@@ -1,10 +1,22 @@
+import json
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
-from app.database import init_db
+from app.database import init_db, async_session_maker
 from app.api.v1.router import api_router
+from app.api import media
 from app.websocket.manager import manager
+from app.core.security import principal_cache, password_executor, get_current_user
+from app.core.images import image_processor
+from app.core.storage import get_storage
+from app.core.page_cache import feed_cache
+from app.services.publisher import post_publisher
+from app.services.message_batcher import message_batcher
+from app.services.notification_aggregator import notification_aggregator
+from app.services.suggestion_engine import suggestion_engine
+from app.schemas.message import ClientSendMessage
 
 settings = get_settings()
 
@@ -13,7 +25,19 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     await init_db()
+    await post_publisher.start()
+    await manager.start()
+    message_batcher.start()
+    suggestion_engine.start()
     yield
+    await suggestion_engine.stop()
+    await message_batcher.stop()
+    await notification_aggregator.stop()
+    await manager.stop()
+    await post_publisher.stop()
+    password_executor.shutdown()
+    image_processor.shutdown()
+    get_storage().shutdown()
 
 
 app = FastAPI(
@@ -35,6 +59,10 @@ app.add_middleware(
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
+# Serve locally stored media
+if settings.storage_backend == "local":
+    app.include_router(media.router, prefix=settings.media_url)
+
 
 @app.get("/")
 async def root():
@@ -42,22 +70,79 @@ async def root():
     return {"status": "ok", "message": "BIT-MITRA API v2.0 is running"}
 
 
-@app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
+@app.get("/metrics")
+async def metrics():
+    """In-process counters for this worker."""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "password_hash": password_executor.stats(),
+        "image_processing": image_processor.stats(),
+        "storage": get_storage().stats(),
+        "feed_cache": feed_cache.stats(),
+        "post_publisher": post_publisher.stats(),
+        "websocket": manager.stats(),
+        "message_batcher": message_batcher.stats(),
+        "notifications": notification_aggregator.stats(),
+        "suggestions": suggestion_engine.stats(),
+    }
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    token: str = Query(...),
+    resume_from: int | None = Query(None),
+):
     """
     WebSocket endpoint for real-time features.
     
+    Authenticated once at connect with the same JWT as the REST API.
+    Besides "ping", clients can send chat messages as JSON frames (see
+    `ClientSendMessage`); each is answered with `message_ack` or
+    `message_error` carrying the frame's `client_id`.
+    
+    The server sends a `ping` event every `ws_heartbeat_interval_seconds`
+    and clients must answer it with a "pong" text frame: a connection
+    that sends nothing for `ws_idle_timeout_seconds` is closed.
+    
+    Pass the last `seq` received as `resume_from` when reconnecting to get
+    only the events missed in between.
+    
     Follows FastAPI WebSocket documentation:
     https://fastapi.tiangolo.com/advanced/websockets/
     """
-    await manager.connect(websocket, user_id)
+    try:
+        async with async_session_maker() as db:
+            principal = await get_current_user(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    connection = await manager.connect(websocket, str(principal.id), resume_from)
     try:
         while True:
-            # Receive and echo messages (keepalive)
+            # Any inbound frame counts as activity for the idle reaper
             data = await websocket.receive_text()
+            connection.touch()
             # Handle ping/pong or other client messages
             if data == "ping":
-                await websocket.send_text("pong")
-    except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        await manager.broadcast_online_users()
+                manager.reply(connection, "pong")
+                continue
+            if data == "pong":
+                continue
+            
+            try:
+                frame = ClientSendMessage.model_validate_json(data)
+            except ValidationError as exc:
+                manager.reply(connection, json.dumps({
+                    "event": "error",
+                    "data": {"detail": exc.errors(include_url=False, include_context=False, include_input=False)},
+                }))
+                continue
+            
+            message_batcher.submit(connection, principal.id, frame)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the server already closed the socket (eviction)
+        pass
+    finally:
+        await manager.disconnect(connection)
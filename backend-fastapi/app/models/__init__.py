@@ -4,5 +4,8 @@ from app.models.post import Post
 from app.models.comment import Comment
 from app.models.message import Message
 from app.models.conversation import Conversation
+from app.models.timeline import TimelineEntry
+from app.models.image import ImageAsset
+from app.models.notification import Notification
 
-__all__ = ["User", "Post", "Comment", "Message", "Conversation"]
+__all__ = ["User", "Post", "Comment", "Message", "Conversation", "TimelineEntry", "ImageAsset", "Notification"]
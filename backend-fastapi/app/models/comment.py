@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -9,6 +9,10 @@ from app.database import Base
 class Comment(Base):
     """Comment model."""
     __tablename__ = "comments"
+    __table_args__ = (
+        # Latest-comments-per-post lookups
+        Index("ix_comments_post_id_created_at", "post_id", "created_at"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
@@ -37,7 +41,7 @@ class Comment(Base):
     post: Mapped["Post"] = relationship(
         "Post",
         back_populates="comments",
-        lazy="selectin"
+        lazy="raise"
     )
 
 
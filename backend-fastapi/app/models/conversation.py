@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import DateTime, Table, Column, ForeignKey
+from sqlalchemy import DateTime, Table, Column, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -18,12 +18,29 @@ conversation_participants = Table(
 class Conversation(Base):
     """Conversation model for chat."""
     __tablename__ = "conversations"
+    __table_args__ = (
+        # One direct conversation per pair of users
+        UniqueConstraint("user_low_id", "user_high_id", name="uq_conversations_direct_pair"),
+        # The unique constraint covers lookups by user_low_id only
+        Index("ix_conversations_user_high_id", "user_high_id"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
         primary_key=True, 
         default=uuid.uuid4
     )
+    # Canonical (smaller, larger) participant pair of a one-to-one conversation
+    user_low_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        nullable=True
+    )
+    user_high_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -33,10 +50,11 @@ class Conversation(Base):
         lazy="selectin"
     )
     
+    # Unbounded - page through MessageRepository instead of loading it
     messages: Mapped[list["Message"]] = relationship(
         "Message",
         back_populates="conversation",
-        lazy="selectin",
+        lazy="raise",
         order_by="Message.created_at"
     )
 
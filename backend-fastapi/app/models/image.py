@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import String, Text, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class ImageAsset(Base):
+    """
+    Set of derivatives generated from one uploaded file.
+    
+    Keyed by the SHA-256 of the uploaded bytes, so uploading the same file
+    again reuses the stored derivatives instead of re-encoding them.
+    """
+    __tablename__ = "image_assets"
+    
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # Fallback URL for clients that don't use the variants
+    image: Mapped[str] = mapped_column(Text, nullable=False)
+    # MIME type -> srcset string, e.g. {"image/webp": "<url> 320w, <url> 640w"}
+    variants: Mapped[dict[str, str]] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
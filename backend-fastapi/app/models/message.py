@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from sqlalchemy import String, Text, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -9,6 +9,12 @@ from app.database import Base
 class Message(Base):
     """Message model for chat."""
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation's history
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+        # Retried WebSocket sends carry the same client ID and are deduplicated
+        UniqueConstraint("sender_id", "client_id", name="uq_messages_sender_client_id"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
@@ -26,6 +32,8 @@ class Message(Base):
         nullable=False
     )
     message: Mapped[str] = mapped_column(Text, nullable=False)
+    # Client-generated ID of a WebSocket send (NULL for HTTP sends)
+    client_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
     conversation_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), 
         ForeignKey("conversations.id"), 
@@ -49,7 +57,7 @@ class Message(Base):
     conversation: Mapped["Conversation"] = relationship(
         "Conversation",
         back_populates="messages",
-        lazy="selectin"
+        lazy="raise"
     )
 
 
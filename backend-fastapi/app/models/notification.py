@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Enum, DateTime, Integer, Boolean, ForeignKey, Index, Table, Column, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class NotificationType(str, PyEnum):
+    like = "like"
+
+
+# Predicate of the unique index on unread groups; upserts must repeat it
+UNREAD = text("NOT is_read")
+
+
+# Distinct actors folded into each notification
+notification_actors_table = Table(
+    "notification_actors",
+    Base.metadata,
+    Column("notification_id", UUID(as_uuid=True), ForeignKey("notifications.id"), primary_key=True),
+    Column("actor_id", UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True),
+)
+
+
+class Notification(Base):
+    """
+    Aggregated notification.
+    
+    One unread row per (recipient, post, type): further events are folded
+    into it ("alice and 42 others liked your post") until it is read.
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # Unread list, newest activity first
+        Index("ix_notifications_recipient_read_updated_id", "recipient_id", "is_read", "updated_at", "id"),
+        Index("ix_notifications_post_id", "post_id"),
+        # The one unread row per group, also the upsert target
+        Index(
+            "uq_notifications_unread_group",
+            "recipient_id", "post_id", "type",
+            unique=True,
+            postgresql_where=UNREAD,
+            sqlite_where=UNREAD,
+        ),
+    )
+    
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        primary_key=True, 
+        default=uuid.uuid4
+    )
+    recipient_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        nullable=False
+    )
+    type: Mapped[NotificationType] = mapped_column(
+        Enum(NotificationType, name="notification_type_enum", create_constraint=True),
+        nullable=False,
+    )
+    post_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("posts.id"), 
+        nullable=False
+    )
+    # Most recent actor, and how many distinct actors the row aggregates
+    # (see `notification_actors_table`)
+    actor_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        nullable=False
+    )
+    actor_count: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    is_read: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    actor: Mapped["User"] = relationship(
+        "User",
+        foreign_keys=[actor_id],
+        lazy="selectin"
+    )
+
+
+# Forward reference imports
+from app.models.user import User  # noqa: E402, F401
@@ -1,15 +1,27 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, Text, DateTime, ForeignKey
+from enum import Enum as PyEnum
+from sqlalchemy import String, Text, Enum, DateTime, Integer, ForeignKey, Index, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 from app.models.user import likes_table
 
 
+class PostStatus(str, PyEnum):
+    processing = "processing"
+    ready = "ready"
+    failed = "failed"
+
+
 class Post(Base):
     """Post model."""
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination index for the feed
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_author_created_at_id", "author_id", "created_at", "id"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
@@ -18,11 +30,31 @@ class Post(Base):
     )
     caption: Mapped[str | None] = mapped_column(Text, default="")
     image: Mapped[str] = mapped_column(Text, nullable=False)
+    # Copy of the image asset's srcset map so feeds need no join
+    image_variants: Mapped[dict[str, str] | None] = mapped_column(JSON, nullable=True)
     author_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
         ForeignKey("users.id"), 
         nullable=False
     )
+    # Posts published in deferred mode start as processing; only ready posts
+    # are visible in feeds
+    status: Mapped[PostStatus] = mapped_column(
+        Enum(PostStatus, name="post_status_enum", create_constraint=True),
+        default=PostStatus.ready,
+        server_default=PostStatus.ready.name,
+    )
+    publish_attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    publish_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # The worker process currently responsible for publishing the post;
+    # others may take it over once the lease has expired
+    publish_lease_owner: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    publish_lease_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Denormalized counters, updated in the same transaction as likes/comments
+    like_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Bumped on every change visible in PostResponse, for ETags
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -32,10 +64,12 @@ class Post(Base):
         lazy="selectin"
     )
     
+    # Unbounded collections - never loaded implicitly, use the dedicated
+    # repository queries (or an explicit selectinload) instead
     comments: Mapped[list["Comment"]] = relationship(
         "Comment",
         back_populates="post",
-        lazy="selectin",
+        lazy="raise",
         cascade="all, delete-orphan"
     )
     
@@ -44,7 +78,7 @@ class Post(Base):
         "User",
         secondary=likes_table,
         backref="liked_posts",
-        lazy="selectin"
+        lazy="raise"
     )
 
 
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class TimelineEntry(Base):
+    """
+    Materialized home-timeline row.
+    
+    One row per (owner, post), written when the post is created so that
+    reading a home feed is a range scan over the owner's entries.
+    """
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        Index("ix_timeline_entries_owner_created_post", "owner_id", "created_at", "post_id"),
+        Index("ix_timeline_entries_post_id", "post_id"),
+    )
+    
+    owner_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        primary_key=True
+    )
+    post_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("posts.id"), 
+        primary_key=True
+    )
+    author_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), 
+        ForeignKey("users.id"), 
+        nullable=False
+    )
+    # Copy of the post's created_at so the feed can be ordered without a join
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import String, Text, Enum, DateTime, Table, Column, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Text, Enum, DateTime, Integer, Table, Column, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
@@ -19,6 +19,8 @@ followers_table = Table(
     Base.metadata,
     Column("follower_id", UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True),
     Column("following_id", UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True),
+    # Reverse lookup: who follows a given user
+    Index("ix_followers_following_id", "following_id"),
 )
 
 # Association table for bookmarks (many-to-many user-post)
@@ -41,6 +43,10 @@ likes_table = Table(
 class User(Base):
     """User model."""
     __tablename__ = "users"
+    __table_args__ = (
+        # Most followed accounts, for suggestions
+        Index("ix_users_follower_count", "follower_count"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), 
@@ -56,6 +62,11 @@ class User(Base):
         Enum(GenderEnum, name="gender_enum", create_constraint=True),
         nullable=True
     )
+    # Denormalized so fan-out decisions don't need to count followers_table
+    follower_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Bumped on changes to the profile, its connections, posts or bookmarks
+    # (but not on changes within those posts), for ETags
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, 
@@ -63,11 +74,12 @@ class User(Base):
         onupdate=datetime.utcnow
     )
     
-    # Relationships
+    # Relationships - all unbounded, so never loaded implicitly; use
+    # UserRepository.get_by_id(with_relations=True) or an explicit option
     posts: Mapped[list["Post"]] = relationship(
         "Post", 
         back_populates="author",
-        lazy="selectin"
+        lazy="raise"
     )
     
     # Self-referential many-to-many for followers/following
@@ -76,8 +88,8 @@ class User(Base):
         secondary=followers_table,
         primaryjoin=id == followers_table.c.following_id,
         secondaryjoin=id == followers_table.c.follower_id,
-        backref="following",
-        lazy="selectin"
+        backref=backref("following", lazy="raise"),
+        lazy="raise"
     )
     
     # Bookmarks
@@ -85,7 +97,7 @@ class User(Base):
         "Post",
         secondary=bookmarks_table,
         backref="bookmarked_by",
-        lazy="selectin"
+        lazy="raise"
     )
 
 
@@ -1,9 +1,10 @@
 """Comment repository - Database operations for comments."""
 import uuid
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.models.comment import Comment
+from app.models.post import Post
 
 
 class CommentRepository:
@@ -22,11 +23,61 @@ class CommentRepository:
         )
         return list(result.scalars().all())
     
+    async def get_latest_for_posts(
+        self,
+        post_ids: list[uuid.UUID],
+        per_post: int,
+    ) -> dict[uuid.UUID, list[Comment]]:
+        """
+        Get the latest comments of several posts in one query.
+        
+        Uses a top-N-per-group window so only `per_post` comments are read
+        for each post, however many comments it has.
+        
+        Returns:
+            dict: Post ID to its latest comments, newest first
+        """
+        if not post_ids or per_post <= 0:
+            return {}
+        
+        ranked = (
+            select(
+                Comment.id,
+                func.row_number()
+                .over(
+                    partition_by=Comment.post_id,
+                    order_by=(Comment.created_at.desc(), Comment.id.desc()),
+                )
+                .label("rank"),
+            )
+            .where(Comment.post_id.in_(post_ids))
+            .subquery()
+        )
+        
+        result = await self.db.execute(
+            select(Comment)
+            .join(ranked, Comment.id == ranked.c.id)
+            .where(ranked.c.rank <= per_post)
+            .order_by(Comment.created_at.desc(), Comment.id.desc())
+            .options(selectinload(Comment.author))
+        )
+        
+        previews: dict[uuid.UUID, list[Comment]] = {}
+        for comment in result.scalars().all():
+            previews.setdefault(comment.post_id, []).append(comment)
+        return previews
+    
     async def create(self, comment: Comment) -> Comment:
-        """Create a new comment."""
+        """Create a new comment and bump the post's comment counter."""
         self.db.add(comment)
         await self.db.flush()
         
+        await self.db.execute(
+            update(Post)
+            .where(Post.id == comment.post_id)
+            .values(comment_count=Post.comment_count + 1, revision=Post.revision + 1)
+        )
+        
         # Refresh with author
         result = await self.db.execute(
             select(Comment)
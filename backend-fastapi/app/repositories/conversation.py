@@ -0,0 +1,108 @@
+"""Conversation repository - Database operations for conversations."""
+import uuid
+from datetime import datetime
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import insert_ignore
+from app.models.conversation import Conversation, conversation_participants
+from app.models.message import Message
+
+
+def direct_pair(user_a: uuid.UUID, user_b: uuid.UUID) -> tuple[uuid.UUID, uuid.UUID]:
+    """Order two user IDs into the canonical (low, high) key."""
+    return (user_a, user_b) if user_a <= user_b else (user_b, user_a)
+
+
+class ConversationRepository:
+    """Repository for Conversation database operations."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_direct_id(self, user_a: uuid.UUID, user_b: uuid.UUID) -> uuid.UUID | None:
+        """Get the ID of the direct conversation between two users."""
+        low, high = direct_pair(user_a, user_b)
+        result = await self.db.execute(
+            select(Conversation.id).where(
+                Conversation.user_low_id == low,
+                Conversation.user_high_id == high,
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def create_direct(self, user_a: uuid.UUID, user_b: uuid.UUID) -> uuid.UUID:
+        """
+        Create the direct conversation between two users.
+        
+        Safe under concurrent first messages: the insert is a no-op when
+        another request created the pair first, and that row is returned.
+        """
+        low, high = direct_pair(user_a, user_b)
+        conversation_id = uuid.uuid4()
+        
+        result = await self.db.execute(
+            insert_ignore(Conversation).values(
+                id=conversation_id,
+                user_low_id=low,
+                user_high_id=high,
+                created_at=datetime.utcnow(),
+            )
+        )
+        
+        if not result.rowcount:
+            # Lost the race - the unique pair constraint kept the other row
+            return await self.get_direct_id(low, high)
+        
+        await self.db.execute(
+            insert_ignore(conversation_participants).values([
+                {"conversation_id": conversation_id, "user_id": low},
+                {"conversation_id": conversation_id, "user_id": high},
+            ])
+        )
+        return conversation_id
+    
+    async def backfill_direct_pairs(self) -> int:
+        """
+        Set the pair columns of two-person conversations created before
+        they existed. A conversation whose pair already has one (e.g. one
+        started after upgrading) is merged into it: its messages move
+        over and it is deleted.
+        
+        Returns:
+            int: Number of conversations paired or merged
+        """
+        result = await self.db.execute(
+            select(conversation_participants.c.conversation_id, conversation_participants.c.user_id)
+            .join(Conversation, Conversation.id == conversation_participants.c.conversation_id)
+            .where(Conversation.user_low_id.is_(None))
+            .order_by(Conversation.created_at, Conversation.id)
+        )
+        participants: dict[uuid.UUID, list[uuid.UUID]] = {}
+        for conversation_id, user_id in result:
+            participants.setdefault(conversation_id, []).append(user_id)
+        
+        fixed = 0
+        for conversation_id, user_ids in participants.items():
+            if len(user_ids) != 2:
+                continue
+            
+            low, high = direct_pair(*user_ids)
+            if existing_id := await self.get_direct_id(low, high):
+                await self.db.execute(
+                    update(Message)
+                    .where(Message.conversation_id == conversation_id)
+                    .values(conversation_id=existing_id)
+                )
+                await self.db.execute(
+                    delete(conversation_participants)
+                    .where(conversation_participants.c.conversation_id == conversation_id)
+                )
+                await self.db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+            else:
+                await self.db.execute(
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id)
+                    .values(user_low_id=low, user_high_id=high)
+                )
+            fixed += 1
+        return fixed
@@ -0,0 +1,37 @@
+"""Image asset repository - Database operations for uploaded image derivatives."""
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import insert_ignore
+from app.models.image import ImageAsset
+
+
+class ImageAssetRepository:
+    """Repository for ImageAsset database operations."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get(self, content_hash: str) -> ImageAsset | None:
+        """Get an asset by the hash of its uploaded bytes."""
+        result = await self.db.execute(
+            select(ImageAsset).where(ImageAsset.content_hash == content_hash)
+        )
+        return result.scalar_one_or_none()
+    
+    async def create(self, content_hash: str, image: str, variants: dict[str, str]) -> ImageAsset:
+        """
+        Record an asset. Idempotent.
+        
+        Concurrent uploads of the same file write identical derivatives,
+        so whichever row lands first is kept and returned.
+        """
+        await self.db.execute(
+            insert_ignore(ImageAsset).values(
+                content_hash=content_hash,
+                image=image,
+                variants=variants,
+                created_at=datetime.utcnow(),
+            )
+        )
+        return await self.get(content_hash)
@@ -0,0 +1,67 @@
+"""Message repository - Database operations for chat messages."""
+import uuid
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import insert_ignore
+from app.models.message import Message
+
+
+class MessageRepository:
+    """Repository for Message database operations."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_page(
+        self,
+        conversation_id: uuid.UUID,
+        limit: int,
+        before: tuple[datetime, uuid.UUID] | None = None,
+        after: tuple[datetime, uuid.UUID] | None = None,
+    ) -> list[Message]:
+        """
+        Get a page of a conversation's messages, oldest first.
+        
+        Without `after`, returns the newest messages strictly older than
+        `before` (or the newest overall). With `after`, returns the oldest
+        messages strictly newer than it. Both are range scans on
+        `(conversation_id, created_at, id)`.
+        """
+        key = tuple_(Message.created_at, Message.id)
+        query = select(Message).where(Message.conversation_id == conversation_id).limit(limit)
+        
+        if after:
+            query = query.where(key > after).order_by(Message.created_at, Message.id)
+            result = await self.db.execute(query)
+            return list(result.scalars().all())
+        
+        if before:
+            query = query.where(key < before)
+        
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+        result = await self.db.execute(query)
+        return list(reversed(result.scalars().all()))
+    
+    async def create(self, message: Message) -> Message:
+        """Create a new message."""
+        self.db.add(message)
+        await self.db.flush()
+        return message
+    
+    async def create_many_ignore(self, rows: list[dict]) -> None:
+        """
+        Insert messages in one statement, skipping any whose
+        `(sender_id, client_id)` already exists.
+        """
+        await self.db.execute(insert_ignore(Message), rows)
+    
+    async def get_by_client_ids(self, keys: list[tuple[uuid.UUID, str]]) -> list[Message]:
+        """Get messages by `(sender_id, client_id)` pairs."""
+        if not keys:
+            return []
+        
+        result = await self.db.execute(
+            select(Message).where(tuple_(Message.sender_id, Message.client_id).in_(keys))
+        )
+        return list(result.scalars().all())
@@ -0,0 +1,125 @@
+"""Notification repository - Database operations for aggregated notifications."""
+import uuid
+from datetime import datetime
+from sqlalchemy import select, update, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import insert_ignore, insert_or_update
+from app.models.notification import Notification, NotificationType, UNREAD, notification_actors_table
+
+# (recipient_id, post_id, type)
+GroupKey = tuple[uuid.UUID, uuid.UUID, NotificationType]
+
+
+class NotificationRepository:
+    """Repository for Notification database operations."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_by_ids(self, notification_ids: list[uuid.UUID]) -> list[Notification]:
+        """Get notifications by ID, with their actors."""
+        if not notification_ids:
+            return []
+        
+        result = await self.db.execute(
+            select(Notification).where(Notification.id.in_(notification_ids))
+        )
+        return list(result.scalars().all())
+    
+    async def upsert_unread(self, rows: list[dict]) -> dict[GroupKey, uuid.UUID]:
+        """
+        Insert an unread notification per row, or fold it into the existing
+        unread one of its group (taking its `actor_id` and `updated_at`).
+        
+        Returns:
+            dict: Notification ID of each group
+        """
+        if not rows:
+            return {}
+        
+        result = await self.db.execute(
+            insert_or_update(Notification, ["recipient_id", "post_id", "type"], ["actor_id", "updated_at"], where=UNREAD)
+            .values(rows)
+            .returning(Notification.id, Notification.recipient_id, Notification.post_id, Notification.type)
+        )
+        return {(row.recipient_id, row.post_id, row.type): row.id for row in result}
+    
+    async def add_actors(self, actors: list[tuple[uuid.UUID, uuid.UUID]]) -> None:
+        """Record `(notification_id, actor_id)` pairs; known actors are ignored."""
+        if not actors:
+            return
+        
+        await self.db.execute(
+            insert_ignore(notification_actors_table).values(
+                [{"notification_id": notification_id, "actor_id": actor_id} for notification_id, actor_id in actors]
+            )
+        )
+    
+    async def refresh_actor_counts(self, notification_ids: list[uuid.UUID]) -> None:
+        """Set `actor_count` to the number of distinct actors recorded."""
+        if not notification_ids:
+            return
+        
+        await self.db.execute(
+            update(Notification)
+            .where(Notification.id.in_(notification_ids))
+            .values(actor_count=(
+                select(func.count())
+                .where(notification_actors_table.c.notification_id == Notification.id)
+                .scalar_subquery()
+            ))
+        )
+    
+    async def get_page(
+        self,
+        recipient_id: uuid.UUID,
+        limit: int,
+        unread_only: bool = True,
+        before: tuple[datetime, uuid.UUID] | None = None,
+    ) -> list[Notification]:
+        """Get a recipient's notifications, most recently updated first."""
+        query = (
+            select(Notification)
+            .where(Notification.recipient_id == recipient_id)
+            .order_by(Notification.updated_at.desc(), Notification.id.desc())
+            .limit(limit)
+        )
+        if unread_only:
+            query = query.where(Notification.is_read.is_(False))
+        if before:
+            query = query.where(tuple_(Notification.updated_at, Notification.id) < before)
+        
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+    
+    async def count_unread(self, recipient_id: uuid.UUID) -> int:
+        """Count a recipient's unread notifications."""
+        result = await self.db.execute(
+            select(func.count()).where(
+                Notification.recipient_id == recipient_id,
+                Notification.is_read.is_(False),
+            )
+        )
+        return result.scalar_one()
+    
+    async def mark_read(
+        self,
+        recipient_id: uuid.UUID,
+        notification_ids: list[uuid.UUID] | None = None,
+    ) -> int:
+        """
+        Mark a recipient's notifications read - the given ones, or all.
+        
+        Returns:
+            int: Number of notifications marked read
+        """
+        query = (
+            update(Notification)
+            .where(Notification.recipient_id == recipient_id, Notification.is_read.is_(False))
+            .values(is_read=True)
+        )
+        if notification_ids is not None:
+            query = query.where(Notification.id.in_(notification_ids))
+        
+        result = await self.db.execute(query)
+        return result.rowcount
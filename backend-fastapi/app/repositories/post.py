@@ -1,11 +1,15 @@
 """Post repository - Database operations for posts."""
 import uuid
-from sqlalchemy import select, delete as sql_delete
+from datetime import datetime
+from sqlalchemy import Row, select, update, func, tuple_, or_, delete as sql_delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.models.post import Post
+from app.models.post import Post, PostStatus
 from app.models.comment import Comment
-from app.models.user import User
+from app.database import insert_ignore
+from app.models.user import User, likes_table, bookmarks_table
+from app.models.timeline import TimelineEntry
+from app.models.notification import Notification, notification_actors_table
 
 
 class PostRepository:
@@ -15,42 +19,114 @@ class PostRepository:
         self.db = db
     
     async def get_by_id(self, post_id: uuid.UUID) -> Post | None:
-        """Get post by ID with all relations."""
+        """Get post by ID with author."""
         result = await self.db.execute(
             select(Post)
             .where(Post.id == post_id)
-            .options(
-                selectinload(Post.author),
-                selectinload(Post.likes),
-                selectinload(Post.comments).selectinload(Comment.author),
-            )
+            .options(selectinload(Post.author))
         )
         return result.scalar_one_or_none()
     
-    async def get_all(self) -> list[Post]:
-        """Get all posts sorted by newest first."""
+    async def get_author_id(self, post_id: uuid.UUID) -> uuid.UUID | None:
+        """Get a post's author ID (None if the post doesn't exist) without loading it."""
+        result = await self.db.execute(select(Post.author_id).where(Post.id == post_id))
+        return result.scalar_one_or_none()
+    
+    async def exists(self, post_id: uuid.UUID) -> bool:
+        """Check whether a post exists without loading it."""
+        result = await self.db.execute(select(Post.id).where(Post.id == post_id))
+        return result.scalar_one_or_none() is not None
+    
+    async def get_existing_ids(self, post_ids: set[uuid.UUID]) -> set[uuid.UUID]:
+        """Get which of the given post IDs exist."""
+        if not post_ids:
+            return set()
+        
+        result = await self.db.execute(select(Post.id).where(Post.id.in_(post_ids)))
+        return set(result.scalars().all())
+    
+    async def get_by_ids(self, post_ids: list[uuid.UUID]) -> list[Post]:
+        """Get published posts by IDs sorted by newest first."""
+        if not post_ids:
+            return []
+        
         result = await self.db.execute(
             select(Post)
-            .order_by(Post.created_at.desc())
-            .options(
-                selectinload(Post.author),
-                selectinload(Post.likes),
-                selectinload(Post.comments).selectinload(Comment.author),
-            )
+            .where(Post.id.in_(post_ids), Post.status == PostStatus.ready)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .options(selectinload(Post.author))
+        )
+        return list(result.scalars().all())
+    
+    async def get_page(
+        self,
+        limit: int,
+        before: tuple[datetime, uuid.UUID] | None = None,
+        author_ids: list[uuid.UUID] | None = None,
+    ) -> list[Post]:
+        """
+        Get a page of posts sorted by newest first, optionally restricted
+        to the given authors.
+        
+        Keyset pagination on `(created_at, id)`: only posts strictly older
+        than `before` are returned, so each page is an index range scan.
+        """
+        query = (
+            select(Post)
+            .where(Post.status == PostStatus.ready)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit)
+            .options(selectinload(Post.author))
         )
+        
+        if before:
+            query = query.where(tuple_(Post.created_at, Post.id) < before)
+        
+        if author_ids is not None:
+            query = query.where(Post.author_id.in_(author_ids))
+        
+        result = await self.db.execute(query)
         return list(result.scalars().all())
     
+    async def get_comments_version(self, post_id: uuid.UUID) -> Row | None:
+        """
+        Get a version stamp for a post's comments without loading them.
+        
+        Comments are append-only, so their count versions the list; the
+        summed revisions of their authors only grow, so they change when
+        a commenter's name or avatar does.
+        
+        Returns:
+            Row | None: `(comment_count, authors_revision)`, or None if the
+            post doesn't exist
+        """
+        authors_revision = (
+            select(func.coalesce(func.sum(User.revision), 0))
+            .join(Comment, Comment.author_id == User.id)
+            .where(Comment.post_id == post_id)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            select(Post.comment_count, authors_revision).where(Post.id == post_id)
+        )
+        return result.one_or_none()
+    
+    async def get_likers(self, post_id: uuid.UUID) -> list[Row]:
+        """Get basic info (id, user_name, profile_picture) of users who liked a post."""
+        result = await self.db.execute(
+            select(User.id, User.user_name, User.profile_picture)
+            .join(likes_table, likes_table.c.user_id == User.id)
+            .where(likes_table.c.post_id == post_id)
+        )
+        return list(result.all())
+    
     async def get_by_author(self, author_id: uuid.UUID) -> list[Post]:
-        """Get all posts by author."""
+        """Get all posts by author, including ones still processing or failed."""
         result = await self.db.execute(
             select(Post)
             .where(Post.author_id == author_id)
             .order_by(Post.created_at.desc())
-            .options(
-                selectinload(Post.author),
-                selectinload(Post.likes),
-                selectinload(Post.comments).selectinload(Comment.author),
-            )
+            .options(selectinload(Post.author))
         )
         return list(result.scalars().all())
     
@@ -58,57 +134,266 @@ class PostRepository:
         """Create a new post."""
         self.db.add(post)
         await self.db.flush()
+        await self._touch_users(User.id == post.author_id)
         
         # Refresh with relations
         result = await self.db.execute(
             select(Post)
             .where(Post.id == post.id)
-            .options(selectinload(Post.author), selectinload(Post.comments))
+            .options(selectinload(Post.author))
         )
         return result.scalar_one()
     
+    async def claim_expired_leases(
+        self,
+        owner: uuid.UUID,
+        until: datetime,
+        now: datetime,
+    ) -> list[uuid.UUID]:
+        """
+        Take over processing posts whose publish lease has expired.
+        
+        A single conditional UPDATE, so each post is claimed by exactly one
+        worker process.
+        
+        Returns:
+            list: IDs of the claimed posts
+        """
+        result = await self.db.execute(
+            update(Post.__table__)
+            .where(
+                Post.status == PostStatus.processing,
+                or_(Post.publish_lease_until.is_(None), Post.publish_lease_until < now),
+            )
+            .values(publish_lease_owner=owner, publish_lease_until=until)
+            .returning(Post.id)
+        )
+        return list(result.scalars().all())
+    
+    async def renew_lease(self, post_id: uuid.UUID, owner: uuid.UUID, until: datetime) -> bool:
+        """
+        Extend `owner`'s publish lease on a processing post.
+        
+        Returns:
+            bool: False if the post is gone, no longer processing or was
+            taken over by another worker process
+        """
+        result = await self.db.execute(
+            update(Post.__table__)
+            .where(
+                Post.id == post_id,
+                Post.status == PostStatus.processing,
+                Post.publish_lease_owner == owner,
+            )
+            .values(publish_lease_until=until)
+        )
+        return bool(result.rowcount)
+    
+    async def mark_ready(
+        self,
+        post_id: uuid.UUID,
+        image: str,
+        image_variants: dict[str, str],
+    ) -> bool:
+        """
+        Attach the published image to a processing post. The post is dated
+        now, so it enters the feeds at the top rather than where it was
+        created, possibly several retries ago.
+        
+        Returns:
+            bool: False if the post was deleted or is no longer processing
+        """
+        result = await self.db.execute(
+            update(Post)
+            .where(Post.id == post_id, Post.status == PostStatus.processing)
+            .values(
+                status=PostStatus.ready,
+                image=image,
+                image_variants=image_variants,
+                publish_error=None,
+                revision=Post.revision + 1,
+                created_at=datetime.utcnow(),
+            )
+        )
+        if not result.rowcount:
+            return False
+        
+        await self._touch_users(User.id == self._author_of(post_id))
+        return True
+    
+    async def release_leases(self, owner: uuid.UUID) -> None:
+        """Expire all of `owner`'s publish leases, e.g. on shutdown."""
+        await self.db.execute(
+            update(Post.__table__)
+            .where(Post.publish_lease_owner == owner, Post.status == PostStatus.processing)
+            .values(publish_lease_until=None)
+        )
+    
+    async def record_publish_failure(self, post_id: uuid.UUID, error: str) -> int | None:
+        """
+        Count a failed publish attempt.
+        
+        Returns:
+            int | None: Attempts so far, or None if the post no longer exists
+        """
+        result = await self.db.execute(
+            update(Post.__table__)
+            .where(Post.id == post_id)
+            .values(
+                publish_attempts=Post.publish_attempts + 1,
+                publish_error=error,
+            )
+            .returning(Post.publish_attempts)
+        )
+        return result.scalar_one_or_none()
+    
+    async def mark_failed(self, post_id: uuid.UUID, error: str) -> None:
+        """Move a processing post to the dead-letter state."""
+        await self.db.execute(
+            update(Post)
+            .where(Post.id == post_id, Post.status == PostStatus.processing)
+            .values(status=PostStatus.failed, publish_error=error)
+        )
+    
     async def delete(self, post_id: uuid.UUID) -> None:
-        """Delete post and associated comments."""
-        # Delete comments
+        """Delete post with its comments, likes, bookmarks, timeline entries and notifications."""
+        # The author's and bookmarkers' profiles lose the post
+        await self._touch_users(or_(
+            User.id == self._author_of(post_id),
+            User.id.in_(select(bookmarks_table.c.user_id).where(bookmarks_table.c.post_id == post_id)),
+        ))
+        
+        # Set-based deletes so the unbounded collections are never loaded
         await self.db.execute(sql_delete(Comment).where(Comment.post_id == post_id))
+        await self.db.execute(sql_delete(likes_table).where(likes_table.c.post_id == post_id))
+        await self.db.execute(sql_delete(bookmarks_table).where(bookmarks_table.c.post_id == post_id))
+        
+        # Remove from materialized timelines
+        await self.db.execute(sql_delete(TimelineEntry).where(TimelineEntry.post_id == post_id))
+        await self.db.execute(
+            sql_delete(notification_actors_table).where(
+                notification_actors_table.c.notification_id.in_(
+                    select(Notification.id).where(Notification.post_id == post_id)
+                )
+            )
+        )
+        await self.db.execute(sql_delete(Notification).where(Notification.post_id == post_id))
         
         # Delete post
-        result = await self.db.execute(select(Post).where(Post.id == post_id))
-        post = result.scalar_one_or_none()
-        if post:
-            await self.db.delete(post)
-            await self.db.flush()
-    
-    async def add_like(self, post: Post, user: User) -> None:
-        """Add a like to post."""
-        if user not in post.likes:
-            post.likes.append(user)
-            await self.db.flush()
-    
-    async def remove_like(self, post: Post, user: User) -> None:
-        """Remove a like from post."""
-        if user in post.likes:
-            post.likes.remove(user)
-            await self.db.flush()
-    
-    async def add_bookmark(self, post: Post, user: User) -> None:
-        """Add post to user's bookmarks."""
+        await self.db.execute(sql_delete(Post).where(Post.id == post_id))
+    
+    async def recount_engagement(self) -> int:
+        """
+        Recompute `like_count` and `comment_count` from the likes and
+        comments tables where they disagree, bumping those posts' revision.
+        
+        Returns:
+            int: Number of posts corrected
+        """
+        likes = (
+            select(func.count())
+            .where(likes_table.c.post_id == Post.id)
+            .scalar_subquery()
+        )
+        comments = (
+            select(func.count())
+            .where(Comment.post_id == Post.id)
+            .scalar_subquery()
+        )
         result = await self.db.execute(
-            select(User).where(User.id == user.id).options(selectinload(User.bookmarks))
+            update(Post)
+            .where(or_(Post.like_count != likes, Post.comment_count != comments))
+            .values(like_count=likes, comment_count=comments, revision=Post.revision + 1)
+            .execution_options(synchronize_session=False)
         )
-        user_with_bookmarks = result.scalar_one()
+        return result.rowcount
+    
+    async def add_like(self, post_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """
+        Like a post. Idempotent.
         
-        if post not in user_with_bookmarks.bookmarks:
-            user_with_bookmarks.bookmarks.append(post)
-            await self.db.flush()
+        Returns:
+            bool: True if the like was added, False if it already existed
+        """
+        result = await self.db.execute(
+            insert_ignore(likes_table).values(user_id=user_id, post_id=post_id)
+        )
+        if not result.rowcount:
+            return False
+        
+        await self._adjust_like_count(post_id, 1)
+        return True
     
-    async def remove_bookmark(self, post: Post, user: User) -> None:
-        """Remove post from user's bookmarks."""
+    async def remove_like(self, post_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """
+        Remove a like from a post. Idempotent.
+        
+        Returns:
+            bool: True if a like was removed, False if there was none
+        """
         result = await self.db.execute(
-            select(User).where(User.id == user.id).options(selectinload(User.bookmarks))
+            sql_delete(likes_table).where(
+                likes_table.c.user_id == user_id,
+                likes_table.c.post_id == post_id,
+            )
         )
-        user_with_bookmarks = result.scalar_one()
+        if not result.rowcount:
+            return False
+        
+        await self._adjust_like_count(post_id, -1)
+        return True
+    
+    async def add_bookmark(self, post_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """
+        Add post to user's bookmarks. Idempotent.
+        
+        Returns:
+            bool: True if the bookmark was added, False if it already existed
+        """
+        result = await self.db.execute(
+            insert_ignore(bookmarks_table).values(user_id=user_id, post_id=post_id)
+        )
+        if not result.rowcount:
+            return False
+        
+        await self._touch_users(User.id == user_id)
+        return True
+    
+    async def remove_bookmark(self, post_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """
+        Remove post from user's bookmarks. Idempotent.
         
-        if post in user_with_bookmarks.bookmarks:
-            user_with_bookmarks.bookmarks.remove(post)
-            await self.db.flush()
+        Returns:
+            bool: True if a bookmark was removed, False if there was none
+        """
+        result = await self.db.execute(
+            sql_delete(bookmarks_table).where(
+                bookmarks_table.c.user_id == user_id,
+                bookmarks_table.c.post_id == post_id,
+            )
+        )
+        if not result.rowcount:
+            return False
+        
+        await self._touch_users(User.id == user_id)
+        return True
+    
+    async def _adjust_like_count(self, post_id: uuid.UUID, delta: int) -> None:
+        """Keep the denormalized like counter in step with the likes table."""
+        await self.db.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(like_count=Post.like_count + delta, revision=Post.revision + 1)
+        )
+    
+    async def _touch_users(self, *criteria) -> None:
+        """Bump the revision of matching users, changing their profile ETags."""
+        await self.db.execute(
+            update(User.__table__)
+            .where(*criteria)
+            .values(revision=User.revision + 1)
+        )
+    
+    @staticmethod
+    def _author_of(post_id: uuid.UUID):
+        return select(Post.author_id).where(Post.id == post_id).scalar_subquery()
@@ -0,0 +1,108 @@
+"""Timeline repository - Database operations for materialized home timelines."""
+import uuid
+from datetime import datetime
+from sqlalchemy import select, delete, literal, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import insert_ignore, insert_or_update
+from app.models.post import Post, PostStatus
+from app.models.timeline import TimelineEntry
+from app.models.user import User, followers_table
+
+
+class TimelineRepository:
+    """Repository for TimelineEntry database operations."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def fan_out(self, post: Post, to_followers: bool = True) -> None:
+        """
+        Write a post into its author's timeline and, unless disabled, into
+        the timeline of every follower with a single INSERT ... SELECT.
+        
+        Entries that already exist (a follow raced with publishing) are
+        re-dated to the post's publish time.
+        """
+        post_id = literal(post.id, UUID(as_uuid=True))
+        author_id = literal(post.author_id, UUID(as_uuid=True))
+        created_at = literal(post.created_at)
+        
+        rows = select(author_id, post_id, author_id, created_at)
+        if to_followers:
+            rows = union_all(
+                rows,
+                select(followers_table.c.follower_id, post_id, author_id, created_at)
+                .where(followers_table.c.following_id == post.author_id),
+            )
+        
+        await self.db.execute(
+            insert_or_update(TimelineEntry, ["owner_id", "post_id"], ["created_at"]).from_select(
+                ["owner_id", "post_id", "author_id", "created_at"],
+                rows,
+            )
+        )
+    
+    async def backfill(self, owner_id: uuid.UUID, author_id: uuid.UUID, limit: int) -> None:
+        """Copy an author's most recent published posts into a new follower's timeline."""
+        recent = (
+            select(
+                literal(owner_id, UUID(as_uuid=True)),
+                Post.id,
+                Post.author_id,
+                Post.created_at,
+            )
+            .where(Post.author_id == author_id, Post.status == PostStatus.ready)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit)
+        )
+        
+        await self.db.execute(
+            insert_ignore(TimelineEntry).from_select(
+                ["owner_id", "post_id", "author_id", "created_at"],
+                recent,
+            )
+        )
+    
+    async def prune(self, owner_id: uuid.UUID, author_id: uuid.UUID) -> None:
+        """Remove an author's posts from a former follower's timeline."""
+        await self.db.execute(
+            delete(TimelineEntry).where(
+                TimelineEntry.owner_id == owner_id,
+                TimelineEntry.author_id == author_id,
+            )
+        )
+    
+    async def get_page(
+        self,
+        owner_id: uuid.UUID,
+        limit: int,
+        before: tuple[datetime, uuid.UUID] | None = None,
+    ) -> list[uuid.UUID]:
+        """Get post IDs from an owner's timeline, newest first."""
+        query = (
+            select(TimelineEntry.post_id)
+            .where(TimelineEntry.owner_id == owner_id)
+            .order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())
+            .limit(limit)
+        )
+        
+        if before:
+            query = query.where(
+                tuple_(TimelineEntry.created_at, TimelineEntry.post_id) < before
+            )
+        
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+    
+    async def get_pull_authors(self, owner_id: uuid.UUID, threshold: int) -> list[uuid.UUID]:
+        """Get followed authors whose posts are merged at read time instead of fanned out."""
+        result = await self.db.execute(
+            select(followers_table.c.following_id)
+            .join(User, User.id == followers_table.c.following_id)
+            .where(
+                followers_table.c.follower_id == owner_id,
+                User.follower_count >= threshold,
+            )
+        )
+        return list(result.scalars().all())
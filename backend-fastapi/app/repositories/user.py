@@ -1,9 +1,14 @@
 """User repository - Database operations for users."""
 import uuid
-from sqlalchemy import select
+from collections.abc import AsyncIterator, Sequence
+from sqlalchemy import Row, select, update, delete, func, literal, union
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.models.user import User
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import insert_ignore
+from app.models.user import User, followers_table, bookmarks_table
+from app.models.post import Post, PostStatus
+from app.models.conversation import Conversation
 
 
 class UserRepository:
@@ -18,8 +23,9 @@ class UserRepository:
         
         if with_relations:
             query = query.options(
-                selectinload(User.posts),
-                selectinload(User.bookmarks),
+                selectinload(User.posts.and_(Post.status == PostStatus.ready)),
+                # Explicit: the User -> Post -> User cycle stops automatic eager loading
+                selectinload(User.bookmarks).selectinload(Post.author),
                 selectinload(User.followers),
                 selectinload(User.following),
             )
@@ -27,6 +33,48 @@ class UserRepository:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
     
+    async def get_profile_version(self, user_id: uuid.UUID) -> Row | None:
+        """
+        Get a version stamp for a user's profile without loading it.
+        
+        The user's revision changes whenever the set of posts, bookmarks or
+        connections does; within one set, the summed post revisions only
+        grow. Together they change on every change to the profile's posts.
+        
+        Returns:
+            Row | None: `(revision, posts_revision, bookmarks_revision)`, or
+            None if the user doesn't exist
+        """
+        posts_revision = (
+            select(func.coalesce(func.sum(Post.revision), 0))
+            .where(Post.author_id == user_id, Post.status == PostStatus.ready)
+            .scalar_subquery()
+        )
+        bookmarks_revision = (
+            select(func.coalesce(func.sum(Post.revision), 0))
+            .join(bookmarks_table, bookmarks_table.c.post_id == Post.id)
+            .where(bookmarks_table.c.user_id == user_id)
+            .scalar_subquery()
+        )
+        
+        result = await self.db.execute(
+            select(User.revision, posts_revision, bookmarks_revision).where(User.id == user_id)
+        )
+        return result.one_or_none()
+    
+    async def exists(self, user_id: uuid.UUID) -> bool:
+        """Check whether a user exists without loading it."""
+        result = await self.db.execute(select(User.id).where(User.id == user_id))
+        return result.scalar_one_or_none() is not None
+    
+    async def get_existing_ids(self, user_ids: set[uuid.UUID]) -> set[uuid.UUID]:
+        """Get which of the given user IDs exist."""
+        if not user_ids:
+            return set()
+        
+        result = await self.db.execute(select(User.id).where(User.id.in_(user_ids)))
+        return set(result.scalars().all())
+    
     async def get_by_email(self, email: str) -> User | None:
         """Get user by email."""
         result = await self.db.execute(select(User).where(User.email == email))
@@ -37,42 +85,183 @@ class UserRepository:
         result = await self.db.execute(select(User).where(User.user_name == username))
         return result.scalar_one_or_none()
     
-    async def get_all_except(self, user_id: uuid.UUID) -> list[User]:
-        """Get all users except specified user."""
-        result = await self.db.execute(select(User).where(User.id != user_id))
+    async def get_by_ids(self, user_ids: list[uuid.UUID]) -> list[User]:
+        """Get users by IDs, in no particular order."""
+        if not user_ids:
+            return []
+        
+        result = await self.db.execute(select(User).where(User.id.in_(user_ids)))
+        return list(result.scalars().all())
+    
+    async def get_follower_counts(self) -> list[Row]:
+        """Get `(id, follower_count)` of every user."""
+        result = await self.db.execute(select(User.id, User.follower_count))
+        return list(result.all())
+    
+    async def stream_follow_edges(self, batch_size: int) -> AsyncIterator[Sequence[Row]]:
+        """Stream every `(follower_id, following_id)` edge in batches."""
+        result = await self.db.stream(
+            select(followers_table.c.follower_id, followers_table.c.following_id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for batch in result.partitions():
+            yield batch
+    
+    async def get_following_ids(self, user_id: uuid.UUID) -> set[uuid.UUID]:
+        """Get IDs of the users this one follows."""
+        result = await self.db.execute(
+            select(followers_table.c.following_id)
+            .where(followers_table.c.follower_id == user_id)
+        )
+        return set(result.scalars().all())
+    
+    async def get_most_followed_ids(self, user_id: uuid.UUID, limit: int) -> list[uuid.UUID]:
+        """Get IDs of the most followed users, excluding this one and those it follows."""
+        followed = (
+            select(followers_table.c.following_id)
+            .where(followers_table.c.follower_id == user_id, followers_table.c.following_id == User.id)
+            .exists()
+        )
+        result = await self.db.execute(
+            select(User.id)
+            .where(User.id != user_id, ~followed)
+            .order_by(User.follower_count.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def recount_followers(self) -> int:
+        """
+        Recompute `follower_count` from the followers table where it
+        disagrees, bumping those users' revision.
+        
+        Returns:
+            int: Number of users corrected
+        """
+        followers = (
+            select(func.count())
+            .where(followers_table.c.following_id == User.id)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            update(User)
+            .where(User.follower_count != followers)
+            .values(follower_count=followers, revision=User.revision + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+    
+    async def get_connected_ids(self, user_id: uuid.UUID) -> list[uuid.UUID]:
+        """
+        Get IDs of users connected to this one in either direction:
+        followers, followed users and direct conversation partners.
+        """
+        result = await self.db.execute(
+            union(
+                select(followers_table.c.follower_id)
+                .where(followers_table.c.following_id == user_id),
+                select(followers_table.c.following_id)
+                .where(followers_table.c.follower_id == user_id),
+                select(Conversation.user_high_id)
+                .where(Conversation.user_low_id == user_id),
+                select(Conversation.user_low_id)
+                .where(Conversation.user_high_id == user_id),
+            )
+        )
         return list(result.scalars().all())
     
     async def create(self, user: User) -> User:
         """Create a new user."""
         self.db.add(user)
         await self.db.flush()
-        await self.db.refresh(user)
-        return user
+        return await self._reload_with_connections(user.id)
     
     async def update(self, user: User) -> User:
         """Update user."""
+        # Incremented in SQL so concurrent edits can't both write n + 1
+        user.revision = User.revision + 1
         await self.db.flush()
-        await self.db.refresh(user)
-        return user
+        return await self._reload_with_connections(user.id)
+    
+    async def _reload_with_connections(self, user_id: uuid.UUID) -> User:
+        """Reload a user with followers/following, as needed by UserResponse."""
+        result = await self.db.execute(
+            select(User)
+            .where(User.id == user_id)
+            .options(selectinload(User.followers), selectinload(User.following))
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
     
-    async def add_follower(self, user: User, follower: User) -> None:
-        """Add a follower to user."""
+    async def add_follower(self, user_id: uuid.UUID, follower_id: uuid.UUID) -> int | None:
+        """
+        Make `follower_id` follow `user_id`.
+        
+        A single conditional INSERT ... SELECT that only writes when the
+        target user exists and the edge is not already there.
+        
+        Returns:
+            int | None: The target's new follower count, or None if nothing
+            was inserted (already following or target missing)
+        """
         result = await self.db.execute(
-            select(User).where(User.id == user.id).options(selectinload(User.followers))
+            insert_ignore(followers_table).from_select(
+                ["follower_id", "following_id"],
+                select(literal(follower_id, UUID(as_uuid=True)), User.id)
+                .where(User.id == user_id),
+            )
         )
-        user_with_followers = result.scalar_one()
+        if not result.rowcount:
+            return None
         
-        if follower not in user_with_followers.followers:
-            user_with_followers.followers.append(follower)
-            await self.db.flush()
+        await self.touch(follower_id)
+        return await self._adjust_follower_count(user_id, 1)
     
-    async def remove_follower(self, user: User, follower: User) -> None:
-        """Remove a follower from user."""
+    async def remove_follower(self, user_id: uuid.UUID, follower_id: uuid.UUID) -> bool:
+        """
+        Make `follower_id` stop following `user_id`.
+        
+        Returns:
+            bool: True if the edge existed and was removed
+        """
         result = await self.db.execute(
-            select(User).where(User.id == user.id).options(selectinload(User.followers))
+            delete(followers_table).where(
+                followers_table.c.follower_id == follower_id,
+                followers_table.c.following_id == user_id,
+            )
         )
-        user_with_followers = result.scalar_one()
+        if not result.rowcount:
+            return False
         
-        if follower in user_with_followers.followers:
-            user_with_followers.followers.remove(follower)
-            await self.db.flush()
+        await self.touch(follower_id)
+        await self._adjust_follower_count(user_id, -1)
+        return True
+    
+    async def touch(self, user_id: uuid.UUID) -> None:
+        """Bump a user's revision, changing their profile ETag."""
+        await self.db.execute(
+            update(User.__table__)
+            .where(User.id == user_id)
+            .values(revision=User.revision + 1)
+        )
+    
+    async def touch_posts(self, author_id: uuid.UUID) -> None:
+        """Bump the revision of all of an author's posts, e.g. after an avatar change."""
+        await self.db.execute(
+            update(Post.__table__)
+            .where(Post.author_id == author_id)
+            .values(revision=Post.revision + 1)
+        )
+    
+    async def _adjust_follower_count(self, user_id: uuid.UUID, delta: int) -> int:
+        """
+        Keep the denormalized follower counter in step and bump the user's
+        revision (their follower list changed); returns the new count.
+        """
+        result = await self.db.execute(
+            update(User.__table__)
+            .where(User.id == user_id)
+            .values(follower_count=User.follower_count + delta, revision=User.revision + 1)
+            .returning(User.follower_count)
+        )
+        return result.scalar_one()
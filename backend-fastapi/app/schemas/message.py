@@ -1,5 +1,6 @@
 from uuid import UUID
 from datetime import datetime
+from typing import Literal
 from pydantic import BaseModel, Field
 
 
@@ -14,11 +15,25 @@ class MessageResponse(BaseModel):
     sender_id: UUID
     receiver_id: UUID
     message: str
+    client_id: str | None = None
     created_at: datetime
     
     model_config = {"from_attributes": True}
 
 
+class ClientSendMessage(BaseModel):
+    """
+    WebSocket frame for sending a message.
+    
+    `client_id` is generated by the client and echoed in the ack; resending
+    with the same `client_id` never stores the message twice.
+    """
+    type: Literal["send_message"]
+    client_id: str = Field(..., min_length=1, max_length=64)
+    receiver_id: UUID
+    message: str = Field(..., min_length=1, max_length=5000)
+
+
 class SendMessageResponse(BaseModel):
     """Response after sending a message."""
     success: bool = True
@@ -26,6 +41,14 @@ class SendMessageResponse(BaseModel):
 
 
 class GetMessagesResponse(BaseModel):
-    """List of messages response."""
+    """
+    Page of messages response, oldest first.
+    
+    Pass `before_cursor` as `before` to load older history and
+    `after_cursor` as `after` to fetch only newer messages.
+    """
     success: bool = True
     messages: list[MessageResponse]
+    has_more: bool = False
+    before_cursor: str | None = None
+    after_cursor: str | None = None
@@ -0,0 +1,51 @@
+from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel, Field, computed_field
+
+
+class NotificationActor(BaseModel):
+    """Most recent user behind a notification."""
+    id: UUID
+    user_name: str
+    profile_picture: str = ""
+    
+    model_config = {"from_attributes": True}
+
+
+class NotificationResponse(BaseModel):
+    """Aggregated notification response."""
+    id: UUID
+    type: str
+    post_id: UUID
+    actor: NotificationActor
+    actor_count: int
+    is_read: bool
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = {"from_attributes": True}
+    
+    @computed_field
+    @property
+    def message(self) -> str:
+        """e.g. "alice and 42 others liked your post"."""
+        others = self.actor_count - 1
+        who = self.actor.user_name
+        if others == 1:
+            who += " and 1 other"
+        elif others > 1:
+            who += f" and {others} others"
+        return f"{who} liked your post"
+
+
+class NotificationListResponse(BaseModel):
+    """Page of notifications response."""
+    notifications: list[NotificationResponse]
+    unread_count: int
+    next_cursor: str | None = None
+    success: bool = True
+
+
+class MarkReadRequest(BaseModel):
+    """Mark notifications read; omit `ids` to mark all."""
+    ids: list[UUID] | None = Field(None, max_length=500)
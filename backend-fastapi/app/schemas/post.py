@@ -1,6 +1,6 @@
 from uuid import UUID
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from app.schemas.comment import CommentResponse
 
 
@@ -19,16 +19,34 @@ class PostRequest(BaseModel):
 
 
 class PostResponse(BaseModel):
-    """Post response - used with response_model for automatic serialization."""
+    """
+    Post response - used with response_model for automatic serialization.
+    
+    Carries counters and a short preview of the latest comments; the full
+    lists are served by the likes and comments endpoints.
+    
+    `image_variants` maps a MIME type to a srcset string, for use in a
+    `<picture>` element; `image` is the JPEG fallback. Both are empty while
+    `status` is "processing".
+    """
     id: UUID
     caption: str = ""
     image: str
+    image_variants: dict[str, str] = {}
+    status: str = "ready"
     author: PostAuthor
-    likes: list[PostAuthor] = []
-    comments: list[CommentResponse] = []
+    like_count: int = 0
+    comment_count: int = 0
+    latest_comments: list[CommentResponse] = []
     created_at: datetime
     
     model_config = {"from_attributes": True}
+    
+    @field_validator("image_variants", mode="before")
+    @classmethod
+    def default_variants(cls, v: dict[str, str] | None) -> dict[str, str]:
+        """Posts created before derivatives existed have none."""
+        return v or {}
 
 
 class PostCreateResponse(BaseModel):
@@ -38,7 +56,14 @@ class PostCreateResponse(BaseModel):
     success: bool = True
 
 
+class PostLikesResponse(BaseModel):
+    """Users who liked a post."""
+    likes: list[PostAuthor]
+    success: bool = True
+
+
 class PostListResponse(BaseModel):
     """List of posts response."""
     posts: list[PostResponse]
+    next_cursor: str | None = None
     success: bool = True
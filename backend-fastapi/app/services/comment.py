@@ -2,6 +2,8 @@
 import uuid
 from fastapi import HTTPException, status
 from app.models.comment import Comment
+from app.core.etag import make_etag
+from app.core.page_cache import feed_cache
 from app.repositories.comment import CommentRepository
 from app.repositories.post import PostRepository
 
@@ -26,9 +28,7 @@ class CommentService:
             HTTPException: If post not found
         """
         # Verify post exists
-        post = await self.post_repo.get_by_id(post_id)
-        
-        if not post:
+        if not await self.post_repo.exists(post_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Post not found",
@@ -40,7 +40,25 @@ class CommentService:
             post_id=post_id,
         )
         
-        return await self.comment_repo.create(comment)
+        comment = await self.comment_repo.create(comment)
+        # The post's comment count and preview are on feed pages
+        feed_cache.invalidate_on_commit(self.comment_repo.db, [post_id])
+        return comment
+    
+    async def get_comments_etag(self, post_id: uuid.UUID) -> str:
+        """
+        ETag of a post's comments, covering their authors' names and avatars.
+        
+        Raises:
+            HTTPException: If post not found
+        """
+        version = await self.post_repo.get_comments_version(post_id)
+        if version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post not found",
+            )
+        return make_etag("comments", post_id, tuple(version))
     
     async def get_post_comments(self, post_id: uuid.UUID) -> list[Comment]:
         """Get all comments for a post."""
@@ -0,0 +1,63 @@
+"""Image service - Derivative generation and storage for uploaded images."""
+import asyncio
+import hashlib
+from pathlib import Path
+from app.core.images import ImageVariant, image_processor
+from app.core.storage import StorageBackend
+from app.models.image import ImageAsset
+from app.repositories.image import ImageAssetRepository
+
+
+class ImageService:
+    """Service layer for content-addressed image derivatives."""
+    
+    def __init__(self, repo: ImageAssetRepository, storage: StorageBackend):
+        self.repo = repo
+        self.storage = storage
+    
+    async def store_post_image(self, path: Path) -> ImageAsset:
+        """
+        Generate and store the derivatives of an uploaded image file.
+        
+        Files are keyed by the SHA-256 of the upload, so a re-upload of the
+        same bytes returns the existing asset without re-encoding.
+        """
+        content_hash = await asyncio.to_thread(self._hash_file, path)
+        
+        asset = await self.repo.get(content_hash)
+        if asset:
+            return asset
+        
+        result = await image_processor.generate_variants(path)
+        variants = sorted(result.variants, key=lambda v: v.width)
+        
+        urls = await asyncio.gather(*(
+            self.storage.save(self._key(content_hash, v), v.data, v.content_type)
+            for v in variants
+        ))
+        
+        srcsets: dict[str, list[str]] = {}
+        for variant, url in zip(variants, urls):
+            srcsets.setdefault(variant.content_type, []).append(f"{url} {variant.width}w")
+        
+        # Largest JPEG, or the largest variant if JPEG isn't configured
+        fallback = next(
+            (url for v, url in zip(reversed(variants), reversed(urls)) if v.format == "jpeg"),
+            urls[-1],
+        )
+        
+        return await self.repo.create(
+            content_hash,
+            fallback,
+            {content_type: ", ".join(entries) for content_type, entries in srcsets.items()},
+        )
+    
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        with path.open("rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    
+    @staticmethod
+    def _key(content_hash: str, variant: ImageVariant) -> str:
+        """Storage key, sharded by hash prefix to keep directories small."""
+        return f"images/{content_hash[:2]}/{content_hash}/{variant.width}.{variant.format}"
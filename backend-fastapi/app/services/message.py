@@ -0,0 +1,98 @@
+"""Message service - Business logic for direct messages."""
+import uuid
+from fastapi import HTTPException, status
+from app.models.message import Message
+from app.core.pagination import decode_cursor
+from app.repositories.conversation import ConversationRepository
+from app.repositories.message import MessageRepository
+from app.repositories.user import UserRepository
+
+
+class MessageService:
+    """Service layer for direct message business logic."""
+    
+    def __init__(
+        self,
+        message_repo: MessageRepository,
+        conversation_repo: ConversationRepository,
+        user_repo: UserRepository,
+    ):
+        self.message_repo = message_repo
+        self.conversation_repo = conversation_repo
+        self.user_repo = user_repo
+    
+    async def send_message(
+        self,
+        sender_id: uuid.UUID,
+        receiver_id: uuid.UUID,
+        text: str,
+    ) -> Message:
+        """
+        Send a message, creating the conversation on first contact.
+        
+        Raises:
+            HTTPException: If receiver not found
+        """
+        conversation_id = await self.conversation_repo.get_direct_id(sender_id, receiver_id)
+        
+        if not conversation_id:
+            if not await self.user_repo.exists(receiver_id):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Receiver not found",
+                )
+            conversation_id = await self.conversation_repo.create_direct(sender_id, receiver_id)
+        
+        message = Message(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            message=text,
+            conversation_id=conversation_id,
+        )
+        return await self.message_repo.create(message)
+    
+    async def get_conversation_messages(
+        self,
+        user_id: uuid.UUID,
+        other_user_id: uuid.UUID,
+        limit: int,
+        before: str | None = None,
+        after: str | None = None,
+    ) -> tuple[list[Message], bool]:
+        """
+        Get a page of messages between two users, oldest first.
+        
+        `before` pages backwards through history; `after` fetches only
+        messages newer than a previously seen one.
+        
+        Returns:
+            tuple: Messages and whether more exist in the paging direction
+            
+        Raises:
+            HTTPException: If both `before` and `after` are given
+        """
+        if before and after:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use either 'before' or 'after', not both",
+            )
+        
+        conversation_id = await self.conversation_repo.get_direct_id(user_id, other_user_id)
+        
+        if not conversation_id:
+            return [], False
+        
+        # Fetch one extra row to know whether another page exists
+        messages = await self.message_repo.get_page(
+            conversation_id,
+            limit + 1,
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+        )
+        
+        has_more = len(messages) > limit
+        if has_more:
+            # Drop the extra row from the far end of the paging direction
+            messages = messages[:limit] if after else messages[1:]
+        
+        return messages, has_more
@@ -0,0 +1,201 @@
+"""
+Message batcher - Batched writes for messages sent over WebSocket.
+
+Sends from all connections are queued and written together: one
+transaction per batch, one multi-row INSERT for its messages. After the
+commit each sender gets a `message_ack` and each receiver a
+`new_message` event.
+
+The queue is bounded, as are the sends each connection may have waiting
+in it; sends beyond either limit are rejected right away.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from app.config import get_settings
+from app.core.serialization import dump_json, embed_json
+from app.database import async_session_maker
+from app.models.message import Message
+from app.repositories.conversation import ConversationRepository, direct_pair
+from app.repositories.message import MessageRepository
+from app.repositories.user import UserRepository
+from app.schemas.message import ClientSendMessage, MessageResponse
+from app.websocket.manager import Connection, manager
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PendingSend:
+    """A validated send frame waiting for its batch."""
+    connection: Connection
+    sender_id: uuid.UUID
+    frame: ClientSendMessage
+
+
+class MessageBatcher:
+    """Single writer task that persists queued WebSocket sends in batches."""
+    
+    def __init__(self, max_batch: int, linger: float, max_queue: int, max_inflight: int):
+        self.max_batch = max_batch
+        self.linger = linger
+        self.max_inflight = max_inflight
+        self.queue: asyncio.Queue[PendingSend] = asyncio.Queue(maxsize=max_queue)
+        # Sends queued or being written, per connection
+        self._inflight: dict[Connection, int] = {}
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.stored = 0
+        self.duplicates = 0
+        self.rejected = 0
+    
+    def submit(self, connection: Connection, sender_id: uuid.UUID, frame: ClientSendMessage) -> None:
+        """
+        Queue a send; the sender is acked once it is committed, or gets a
+        `message_error` right away if the connection or the queue is full.
+        """
+        item = PendingSend(connection, sender_id, frame)
+        inflight = self._inflight.get(connection, 0)
+        if inflight >= self.max_inflight:
+            self.rejected += 1
+            self._reject(item, "Too many messages in flight, please retry")
+            return
+        
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            self._reject(item, "Server busy, please retry")
+            return
+        self._inflight[connection] = inflight + 1
+    
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "queued": self.queue.qsize(),
+            "batches": self.batches,
+            "stored": self.stored,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+        }
+    
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            
+            # Let concurrent senders join this transaction
+            if self.linger:
+                await asyncio.sleep(self.linger)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            
+            try:
+                await self._write(batch)
+            except Exception:
+                logger.exception("Failed to store a batch of %d messages", len(batch))
+                for item in batch:
+                    self._reject(item, "Message could not be stored, please retry")
+            finally:
+                for item in batch:
+                    self._done(item.connection)
+    
+    async def _write(self, batch: list[PendingSend]) -> None:
+        """Store a batch and notify senders and receivers."""
+        async with async_session_maker() as session:
+            user_repo = UserRepository(session)
+            conversation_repo = ConversationRepository(session)
+            message_repo = MessageRepository(session)
+            
+            existing = await user_repo.get_existing_ids({item.frame.receiver_id for item in batch})
+            
+            accepted = []
+            for item in batch:
+                if item.frame.receiver_id not in existing:
+                    self._reject(item, "Receiver not found")
+                else:
+                    accepted.append(item)
+            
+            # One lookup (or creation) per distinct conversation in the batch
+            conversations: dict[tuple[uuid.UUID, uuid.UUID], uuid.UUID] = {}
+            for item in accepted:
+                pair = direct_pair(item.sender_id, item.frame.receiver_id)
+                if pair not in conversations:
+                    conversations[pair] = (
+                        await conversation_repo.get_direct_id(*pair)
+                        or await conversation_repo.create_direct(*pair)
+                    )
+            
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "sender_id": item.sender_id,
+                    "receiver_id": item.frame.receiver_id,
+                    "message": item.frame.message,
+                    "client_id": item.frame.client_id,
+                    "conversation_id": conversations[direct_pair(item.sender_id, item.frame.receiver_id)],
+                    "created_at": datetime.utcnow(),
+                }
+                for item in accepted
+            ]
+            if rows:
+                await message_repo.create_many_ignore(rows)
+            
+            stored = await message_repo.get_by_client_ids(
+                [(item.sender_id, item.frame.client_id) for item in accepted]
+            )
+            await session.commit()
+        
+        self.batches += 1
+        new_ids = {row["id"] for row in rows}
+        by_key: dict[tuple[uuid.UUID, str], Message] = {(m.sender_id, m.client_id): m for m in stored}
+        delivered: set[uuid.UUID] = set()
+        
+        for item in accepted:
+            message = by_key[(item.sender_id, item.frame.client_id)]
+            # Serialized once, shared by the ack and the receiver's event
+            data = dump_json(MessageResponse.model_validate(message))
+            ack = embed_json(data, "message", client_id=item.frame.client_id)
+            manager.reply(item.connection, embed_json(ack, "data", event="message_ack").decode())
+            
+            # Retries of an already stored message are acked but not re-delivered
+            if message.id not in new_ids or message.id in delivered:
+                self.duplicates += 1
+                continue
+            
+            delivered.add(message.id)
+            self.stored += 1
+            await manager.send_message(str(message.receiver_id), data)
+    
+    def _done(self, connection: Connection) -> None:
+        remaining = self._inflight.pop(connection, 1) - 1
+        if remaining:
+            self._inflight[connection] = remaining
+    
+    def _reject(self, item: PendingSend, detail: str) -> None:
+        manager.reply(item.connection, self._event("message_error", {"client_id": item.frame.client_id, "detail": detail}))
+    
+    @staticmethod
+    def _event(event: str, data: dict) -> str:
+        return json.dumps({"event": event, "data": data})
+
+
+# Singleton instance
+message_batcher = MessageBatcher(
+    max_batch=settings.chat_batch_max_size,
+    linger=settings.chat_batch_linger_seconds,
+    max_queue=settings.chat_queue_max_size,
+    max_inflight=settings.chat_max_inflight_per_connection,
+)
@@ -0,0 +1,46 @@
+"""Notification service - Business logic for aggregated notifications."""
+import uuid
+from app.models.notification import Notification
+from app.core.pagination import decode_cursor, encode_cursor
+from app.repositories.notification import NotificationRepository
+
+
+class NotificationService:
+    """Service layer for notification business logic."""
+    
+    def __init__(self, repo: NotificationRepository):
+        self.repo = repo
+    
+    async def get_notifications(
+        self,
+        user_id: uuid.UUID,
+        limit: int,
+        unread_only: bool = True,
+        cursor: str | None = None,
+    ) -> tuple[list[Notification], str | None]:
+        """
+        Get a page of a user's notifications.
+        
+        Returns:
+            tuple: Notifications on this page and the cursor for the next page
+            (None when this is the last page)
+        """
+        before = decode_cursor(cursor) if cursor else None
+        
+        # Fetch one extra row to know whether another page exists
+        notifications = await self.repo.get_page(user_id, limit + 1, unread_only, before)
+        
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = encode_cursor(notifications[-1].updated_at, notifications[-1].id)
+        
+        return notifications, next_cursor
+    
+    async def count_unread(self, user_id: uuid.UUID) -> int:
+        """Count a user's unread notifications."""
+        return await self.repo.count_unread(user_id)
+    
+    async def mark_read(self, user_id: uuid.UUID, notification_ids: list[uuid.UUID] | None = None) -> int:
+        """Mark the given notifications (or all) read; returns how many changed."""
+        return await self.repo.mark_read(user_id, notification_ids)
@@ -0,0 +1,157 @@
+"""
+Notification aggregator - Coalesces notification events before storing them.
+
+Events are grouped by (recipient, post, type) over a short window. Each
+window then costs one transaction for all groups and, per group, one
+upserted notification row and one WebSocket frame, however many events
+it folded in. Actors are recorded per notification, so its count stays
+distinct across windows and workers.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from app.config import get_settings
+from app.core.serialization import dump_json
+from app.database import async_session_maker
+from app.models.notification import Notification, NotificationType
+from app.repositories.notification import GroupKey, NotificationRepository
+from app.repositories.post import PostRepository
+from app.schemas.notification import NotificationResponse
+from app.websocket.manager import manager
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class NotificationAggregator:
+    """Buffers notification events and flushes them once per window."""
+    
+    def __init__(self, window: float):
+        self.window = window
+        # Distinct actors of each group in the current window, latest last
+        self._pending: dict[GroupKey, dict[uuid.UUID, None]] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.events = 0
+        self.flushed_groups = 0
+    
+    async def add(
+        self,
+        recipient_id: uuid.UUID,
+        post_id: uuid.UUID,
+        type: NotificationType,
+        actor_id: uuid.UUID,
+    ) -> None:
+        """
+        Record an event; it is stored and pushed with the next flush.
+        
+        A coroutine so it can be queued with BackgroundTasks, which would
+        run a plain function in a thread.
+        """
+        actors = self._pending.setdefault((recipient_id, post_id, type), {})
+        # Re-adding moves the actor to the end, making them the latest
+        actors.pop(actor_id, None)
+        actors[actor_id] = None
+        self.events += 1
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    def discard(
+        self,
+        recipient_id: uuid.UUID,
+        post_id: uuid.UUID,
+        type: NotificationType,
+        actor_id: uuid.UUID,
+    ) -> None:
+        """Withdraw an event not flushed yet, e.g. a like undone within the window."""
+        key = (recipient_id, post_id, type)
+        if actors := self._pending.get(key):
+            actors.pop(actor_id, None)
+            if not actors:
+                del self._pending[key]
+    
+    async def stop(self) -> None:
+        """Flush whatever is pending."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._flush()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "pending_groups": len(self._pending),
+            "events": self.events,
+            "flushed_groups": self.flushed_groups,
+        }
+    
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.window)
+            await self._flush()
+    
+    async def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        
+        try:
+            notifications = await self._store(pending)
+        except Exception:
+            # Isolate the failing group(s) rather than lose the whole window
+            logger.warning("Failed to store %d notification groups together, retrying one by one", len(pending), exc_info=True)
+            notifications = []
+            for key, actors in pending.items():
+                try:
+                    notifications += await self._store({key: actors})
+                except Exception:
+                    logger.exception("Failed to store notification group %s", key)
+        
+        self.flushed_groups += len(notifications)
+        for notification in notifications:
+            await manager.send_notification(
+                str(notification.recipient_id),
+                dump_json(NotificationResponse.model_validate(notification)),
+            )
+    
+    async def _store(self, pending: dict[GroupKey, dict[uuid.UUID, None]]) -> list[Notification]:
+        """
+        Fold each group into its unread row, or insert one, in a single
+        transaction. Groups of posts deleted meanwhile are dropped.
+        """
+        now = datetime.utcnow()
+        
+        async with async_session_maker() as session:
+            repo = NotificationRepository(session)
+            existing = await PostRepository(session).get_existing_ids({post_id for _, post_id, _ in pending})
+            pending = {key: actors for key, actors in pending.items() if key[1] in existing}
+            ids = await repo.upsert_unread([
+                {
+                    "id": uuid.uuid4(),
+                    "recipient_id": recipient_id,
+                    "post_id": post_id,
+                    "type": type,
+                    "actor_id": next(reversed(actors)),
+                    "actor_count": 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for (recipient_id, post_id, type), actors in pending.items()
+            ])
+            await repo.add_actors([
+                (ids[key], actor_id)
+                for key, actors in pending.items()
+                for actor_id in actors
+            ])
+            await repo.refresh_actor_counts(list(ids.values()))
+            await session.commit()
+            
+            # Reload with the (possibly changed) actors for the frames
+            session.expunge_all()
+            return await repo.get_by_ids(list(ids.values()))
+
+
+# Singleton instance
+notification_aggregator = NotificationAggregator(window=settings.notification_window_seconds)
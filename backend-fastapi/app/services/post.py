@@ -1,78 +1,255 @@
 """Post service - Business logic for post operations."""
 import uuid
+from datetime import datetime
+from sqlalchemy import Row
 from fastapi import HTTPException, status, BackgroundTasks
-from app.models.post import Post
-from app.models.user import User
+from app.models.post import Post, PostStatus
+from app.config import get_settings
 from app.repositories.post import PostRepository
-from app.websocket.manager import manager
+from app.repositories.comment import CommentRepository
+from app.repositories.timeline import TimelineRepository
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.etag import make_etag
+from app.core.page_cache import CachedPage, feed_cache
+from app.core.serialization import dump_json
+from app.schemas.post import PostResponse, PostListResponse
+from app.core.security import Principal
+from app.models.notification import NotificationType
+from app.services.notification_aggregator import notification_aggregator
+
+settings = get_settings()
 
 
 class PostService:
     """Service layer for post business logic."""
     
-    def __init__(self, repo: PostRepository):
+    def __init__(
+        self,
+        repo: PostRepository,
+        timeline_repo: TimelineRepository | None = None,
+        comment_repo: CommentRepository | None = None,
+    ):
         self.repo = repo
+        self.timeline_repo = timeline_repo or TimelineRepository(repo.db)
+        self.comment_repo = comment_repo or CommentRepository(repo.db)
     
-    async def create_post(self, caption: str, image_url: str, author_id: uuid.UUID) -> Post:
-        """Create a new post."""
+    async def create_post(
+        self,
+        caption: str,
+        image_url: str,
+        author_id: uuid.UUID,
+        image_variants: dict[str, str] | None = None,
+    ) -> Post:
+        """Create a new post with its image and fan it out."""
         post = Post(
             caption=caption,
             image=image_url,
+            image_variants=image_variants,
+            author_id=author_id,
+        )
+        post = await self.repo.create(post)
+        
+        await self._fan_out(post)
+        feed_cache.invalidate_on_commit(self.repo.db, head=True)
+        return post
+    
+    async def create_pending_post(
+        self,
+        caption: str,
+        author_id: uuid.UUID,
+        lease_owner: uuid.UUID,
+        lease_until: datetime,
+    ) -> Post:
+        """
+        Create a post whose image is still to be published.
+        
+        The post stays out of feeds until `publish_post` is called by the
+        background publisher holding the lease.
+        """
+        post = Post(
+            caption=caption,
+            image="",
+            status=PostStatus.processing,
             author_id=author_id,
+            publish_lease_owner=lease_owner,
+            publish_lease_until=lease_until,
         )
         return await self.repo.create(post)
     
-    async def get_all_posts(self) -> list[Post]:
-        """Get all posts."""
-        return await self.repo.get_all()
+    async def publish_post(
+        self,
+        post_id: uuid.UUID,
+        image_url: str,
+        image_variants: dict[str, str],
+    ) -> Post | None:
+        """
+        Attach the published image to a pending post and fan it out.
+        
+        Returns:
+            Post | None: The ready post, or None if it was deleted meanwhile
+        """
+        if not await self.repo.mark_ready(post_id, image_url, image_variants):
+            return None
+        
+        post = await self.repo.get_by_id(post_id)
+        await self._fan_out(post)
+        # Dated at publish time, so it only lands on head pages
+        feed_cache.invalidate_on_commit(self.repo.db, head=True)
+        return post
+    
+    async def get_all_posts(
+        self,
+        limit: int,
+        cursor: str | None = None,
+    ) -> tuple[list[Post], str | None]:
+        """
+        Get a page of the global feed.
+        
+        Returns:
+            tuple: Posts on this page and the cursor for the next page
+            (None when this is the last page)
+        """
+        before = decode_cursor(cursor) if cursor else None
+        
+        # Fetch one extra row to know whether another page exists
+        posts = await self.repo.get_page(limit + 1, before)
+        
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+        
+        await self._attach_comment_previews(posts)
+        return posts, next_cursor
+    
+    async def get_feed_page(self, limit: int, cursor: str | None = None) -> CachedPage:
+        """
+        Get a global feed page as serialized JSON with its ETag.
+        
+        The feed is the same for every user, so pages are served from
+        `feed_cache` and rebuilt once after a write to one of their posts.
+        """
+        async def build() -> tuple[CachedPage, list[uuid.UUID]]:
+            posts, next_cursor = await self.get_all_posts(limit, cursor)
+            body = dump_json(PostListResponse(
+                posts=[PostResponse.model_validate(p) for p in posts],
+                next_cursor=next_cursor,
+            ))
+            etag = make_etag("feed", limit, cursor, [(p.id, p.revision) for p in posts])
+            return CachedPage(etag, body), [p.id for p in posts]
+        
+        # Only the first page can gain new posts; later pages are keyset-stable
+        return await feed_cache.get_or_build(f"{limit}:{cursor or ''}", build, head=cursor is None)
+    
+    async def get_timeline(
+        self,
+        user_id: uuid.UUID,
+        limit: int,
+        cursor: str | None = None,
+    ) -> tuple[list[Post], str | None]:
+        """
+        Get a page of the user's home timeline (own and followed posts).
+        
+        Fanned-out posts come from the materialized timeline; posts by
+        high-follower authors are merged in from the posts table.
+        
+        Returns:
+            tuple: Posts on this page and the cursor for the next page
+            (None when this is the last page)
+        """
+        before = decode_cursor(cursor) if cursor else None
+        
+        post_ids = await self.timeline_repo.get_page(user_id, limit + 1, before)
+        posts = await self.repo.get_by_ids(post_ids)
+        
+        pull_authors = await self.timeline_repo.get_pull_authors(
+            user_id, settings.timeline_fanout_threshold
+        )
+        if pull_authors:
+            pulled = await self.repo.get_page(limit + 1, before, author_ids=pull_authors)
+            # An author may have crossed the threshold, so dedupe by ID
+            merged = {p.id: p for p in [*posts, *pulled]}
+            posts = sorted(merged.values(), key=lambda p: (p.created_at, p.id), reverse=True)
+        
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+        
+        await self._attach_comment_previews(posts)
+        return posts, next_cursor
     
     async def get_user_posts(self, author_id: uuid.UUID) -> list[Post]:
         """Get posts by specific author."""
-        return await self.repo.get_by_author(author_id)
+        posts = await self.repo.get_by_author(author_id)
+        await self._attach_comment_previews(posts)
+        return posts
+    
+    async def get_likers(self, post_id: uuid.UUID) -> list[Row]:
+        """
+        Get the users who liked a post.
+        
+        Raises:
+            HTTPException: If post not found
+        """
+        if not await self.repo.exists(post_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Post not found",
+            )
+        
+        return await self.repo.get_likers(post_id)
     
     async def like_post(
         self,
         post_id: uuid.UUID,
-        user: User,
+        user: Principal,
         background_tasks: BackgroundTasks,
     ) -> None:
         """
-        Like a post and send notification in background.
+        Like a post and notify its author in background.
         
-        Uses BackgroundTasks - FastAPI standard for non-blocking operations.
+        Idempotent: repeated likes neither double-count nor re-notify.
+        The notification is queued after the like commits (BackgroundTasks)
+        and aggregated with other likes of the post in the same window.
         """
-        post = await self.repo.get_by_id(post_id)
+        author_id = await self.repo.get_author_id(post_id)
         
-        if not post:
+        if not author_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Post not found",
             )
         
-        await self.repo.add_like(post, user)
+        liked = await self.repo.add_like(post_id, user.id)
+        if liked:
+            feed_cache.invalidate_on_commit(self.repo.db, [post_id])
         
-        # Send notification in background - non-blocking
-        if post.author_id != user.id:
+        # Queue the notification in background - non-blocking
+        if liked and author_id != user.id:
             background_tasks.add_task(
-                self._send_like_notification,
-                str(post.author_id),
-                str(user.id),
-                user.user_name,
-                user.profile_picture or "",
-                str(post_id),
+                notification_aggregator.add,
+                author_id,
+                post_id,
+                NotificationType.like,
+                user.id,
             )
     
-    async def unlike_post(self, post_id: uuid.UUID, user: User) -> None:
-        """Unlike a post."""
-        post = await self.repo.get_by_id(post_id)
+    async def unlike_post(self, post_id: uuid.UUID, user: Principal) -> None:
+        """Unlike a post. Idempotent."""
+        if await self.repo.remove_like(post_id, user.id):
+            feed_cache.invalidate_on_commit(self.repo.db, [post_id])
+            # A like undone before its notification went out is never sent
+            if author_id := await self.repo.get_author_id(post_id):
+                notification_aggregator.discard(author_id, post_id, NotificationType.like, user.id)
+            return
         
-        if not post:
+        # Nothing removed - only an error if the post itself is missing
+        if not await self.repo.exists(post_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Post not found",
             )
-        
-        await self.repo.remove_like(post, user)
     
     async def delete_post(self, post_id: uuid.UUID, user_id: uuid.UUID) -> None:
         """
@@ -81,75 +258,63 @@ class PostService:
         Raises:
             HTTPException: If post not found or user not authorized
         """
-        post = await self.repo.get_by_id(post_id)
+        author_id = await self.repo.get_author_id(post_id)
         
-        if not post:
+        if not author_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Post not found",
             )
         
-        if post.author_id != user_id:
+        if author_id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to delete this post",
             )
         
         await self.repo.delete(post_id)
+        feed_cache.invalidate_on_commit(self.repo.db, [post_id])
     
-    async def bookmark_post(self, post_id: uuid.UUID, user: User) -> bool:
+    async def bookmark_post(self, post_id: uuid.UUID, user: Principal) -> bool:
         """
         Toggle bookmark on a post.
         
         Returns:
             bool: True if bookmarked, False if removed
         """
-        post = await self.repo.get_by_id(post_id)
+        if await self.repo.remove_bookmark(post_id, user.id):
+            return False
         
-        if not post:
+        if not await self.repo.exists(post_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Post not found",
             )
         
-        # Check current bookmark status
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        from app.models.user import User as UserModel
+        await self.repo.add_bookmark(post_id, user.id)
+        return True
+    
+    async def _fan_out(self, post: Post) -> None:
+        """
+        Write a post into followers' home timelines.
         
-        result = await self.repo.db.execute(
-            select(UserModel)
-            .where(UserModel.id == user.id)
-            .options(selectinload(UserModel.bookmarks))
+        Authors above `timeline_fanout_threshold` followers skip the fan-out;
+        their posts are pulled in when followers read their timeline.
+        """
+        await self.timeline_repo.fan_out(
+            post,
+            to_followers=post.author.follower_count < settings.timeline_fanout_threshold,
         )
-        user_with_bookmarks = result.scalar_one()
-        
-        if post in user_with_bookmarks.bookmarks:
-            await self.repo.remove_bookmark(post, user)
-            return False
-        else:
-            await self.repo.add_bookmark(post, user)
-            return True
     
-    @staticmethod
-    async def _send_like_notification(
-        author_id: str,
-        user_id: str,
-        user_name: str,
-        profile_picture: str,
-        post_id: str,
-    ) -> None:
-        """Background task to send like notification via WebSocket."""
-        await manager.send_notification(
-            author_id,
-            {
-                "type": "like",
-                "userId": user_id,
-                "userDetails": {
-                    "user_name": user_name,
-                    "profile_picture": profile_picture,
-                },
-                "postId": post_id,
-                "message": "Your post was liked",
-            },
+    async def _attach_comment_previews(self, posts: list[Post]) -> None:
+        """
+        Set `latest_comments` on each post for PostResponse.
+        
+        A plain instance attribute, not a mapped relationship, so it is only
+        populated where a preview is wanted.
+        """
+        previews = await self.comment_repo.get_latest_for_posts(
+            [p.id for p in posts], settings.comment_preview_count
         )
+        for post in posts:
+            post.latest_comments = previews.get(post.id, [])
@@ -0,0 +1,252 @@
+"""
+Post publisher - Background image publishing for deferred posts.
+
+`POST /post` stores the raw upload in a staging directory, creates the
+post as `processing` and returns. Workers here generate and store the
+image derivatives, mark the post ready, fan it out and notify the author
+over WebSocket. Failed jobs are retried with exponential backoff; after
+the last attempt the post is marked `failed` and its staged file is kept
+for inspection.
+
+Every worker process runs a publisher. Each processing post carries a
+lease naming the process that publishes it; a process only works on posts
+it holds the lease for, and takes over posts whose lease has expired.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+from fastapi import HTTPException
+from app.config import get_settings
+from app.core.executor import BoundedExecutor
+from app.core.serialization import dump_json
+from app.core.storage import get_storage, write_file
+from app.database import async_session_maker
+from app.repositories.image import ImageAssetRepository
+from app.repositories.post import PostRepository
+from app.schemas.post import PostResponse
+from app.services.image import ImageService
+from app.services.post import PostService
+from app.websocket.manager import manager
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class PostPublisher:
+    """In-process job queue that publishes staged post images."""
+    
+    def __init__(
+        self,
+        staging_dir: str,
+        workers: int,
+        max_attempts: int,
+        retry_base_delay: float,
+        lease_seconds: float,
+    ):
+        self.staging_dir = Path(staging_dir)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.lease_seconds = lease_seconds
+        # Identifies this process in post leases
+        self.owner_id = uuid.uuid4()
+        self.files = BoundedExecutor("staging", workers)
+        self.queue: asyncio.Queue[uuid.UUID] = asyncio.Queue()
+        # Posts queued or being published here
+        self._jobs: set[uuid.UUID] = set()
+        self._tasks: list[asyncio.Task] = []
+        self.recovered = 0
+        self.published = 0
+        self.retried = 0
+        self.failed = 0
+    
+    async def stage(self, post_id: uuid.UUID, file: BinaryIO) -> None:
+        """Persist the raw upload so the job survives a restart."""
+        await self.files.run(write_file, self._staged_path(post_id), file)
+    
+    def new_lease(self, extra_seconds: float = 0.0) -> tuple[uuid.UUID, datetime]:
+        """Owner and expiry of a lease taken by this process now."""
+        return self.owner_id, datetime.utcnow() + timedelta(seconds=self.lease_seconds + extra_seconds)
+    
+    def enqueue(self, post_id: uuid.UUID) -> None:
+        """
+        Queue a staged post for publishing. The post must be committed
+        with a lease from `new_lease`.
+        """
+        self._jobs.add(post_id)
+        self.queue.put_nowait(post_id)
+    
+    async def discard(self, post_id: uuid.UUID) -> None:
+        """Remove a staged upload, e.g. when its post is deleted."""
+        await self.files.run(self._staged_path(post_id).unlink, missing_ok=True)
+    
+    async def start(self) -> None:
+        """
+        Start workers, and take over posts left processing by a stopped
+        or crashed process, now and whenever their leases expire.
+        """
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_loop()))
+    
+    async def stop(self) -> None:
+        """
+        Cancel workers and give up this process's leases, so unfinished
+        posts are taken over right away by the next process to look.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
+        try:
+            async with async_session_maker() as session:
+                await PostRepository(session).release_leases(self.owner_id)
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to release publish leases")
+        self.files.shutdown()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "queued": self.queue.qsize(),
+            "recovered": self.recovered,
+            "published": self.published,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+    
+    async def _recover_loop(self) -> None:
+        while True:
+            try:
+                await self._recover()
+            except Exception:
+                logger.exception("Failed to recover unpublished posts")
+            await asyncio.sleep(self.lease_seconds)
+    
+    async def _recover(self) -> None:
+        """Claim processing posts with expired leases and queue them."""
+        owner, until = self.new_lease()
+        async with async_session_maker() as session:
+            claimed = await PostRepository(session).claim_expired_leases(owner, until, datetime.utcnow())
+            await session.commit()
+        
+        # A post of ours may have outlived its lease while queued here
+        claimed = [post_id for post_id in claimed if post_id not in self._jobs]
+        for post_id in claimed:
+            self.enqueue(post_id)
+        if claimed:
+            self.recovered += len(claimed)
+            logger.info("Recovered %d unpublished posts", len(claimed))
+    
+    async def _worker(self) -> None:
+        while True:
+            post_id = await self.queue.get()
+            try:
+                await self._publish(post_id)
+            except Exception:
+                logger.exception("Unexpected error publishing post %s", post_id)
+            finally:
+                self._jobs.discard(post_id)
+                self.queue.task_done()
+    
+    async def _publish(self, post_id: uuid.UUID) -> None:
+        """Run one publish attempt for a post, if this process holds its lease."""
+        async with async_session_maker() as session:
+            owned = await PostRepository(session).renew_lease(post_id, *self.new_lease())
+            await session.commit()
+        if not owned:
+            # Published, deleted or taken over by another process
+            return
+        
+        staged = self._staged_path(post_id)
+        if not await self.files.run(staged.exists):
+            await self._dead_letter(post_id, "Staged upload missing")
+            return
+        
+        try:
+            async with async_session_maker() as session:
+                asset = await ImageService(
+                    ImageAssetRepository(session), get_storage()
+                ).store_post_image(staged)
+                post = await PostService(PostRepository(session)).publish_post(
+                    post_id, asset.image, asset.variants
+                )
+                await session.commit()
+        except Exception as exc:
+            await self._handle_failure(post_id, exc)
+            return
+        
+        await self.discard(post_id)
+        if post is None:
+            # Deleted while processing
+            return
+        
+        self.published += 1
+        await manager.send_event(
+            str(post.author_id),
+            "post_ready",
+            dump_json(PostResponse.model_validate(post)),
+        )
+    
+    async def _handle_failure(self, post_id: uuid.UUID, exc: Exception) -> None:
+        """Schedule a retry, or dead-letter the post after its last attempt."""
+        # Client errors such as an undecodable image won't succeed on retry
+        if isinstance(exc, HTTPException) and exc.status_code < 500:
+            await self._dead_letter(post_id, str(exc.detail))
+            return
+        
+        error = str(exc.detail) if isinstance(exc, HTTPException) else repr(exc)
+        async with async_session_maker() as session:
+            repo = PostRepository(session)
+            attempts = await repo.record_publish_failure(post_id, error)
+            delay = self.retry_base_delay * 2 ** ((attempts or 1) - 1)
+            # Keep the post through the backoff so no other process retries it early
+            await repo.renew_lease(post_id, *self.new_lease(delay))
+            await session.commit()
+        
+        if attempts is None:
+            await self.discard(post_id)
+            return
+        
+        if attempts >= self.max_attempts:
+            await self._dead_letter(post_id, error)
+            return
+        
+        logger.warning("Publishing post %s failed (attempt %d), retrying in %.1fs: %s", post_id, attempts, delay, error)
+        self.retried += 1
+        asyncio.get_running_loop().call_later(delay, self.enqueue, post_id)
+    
+    async def _dead_letter(self, post_id: uuid.UUID, error: str) -> None:
+        """Mark a post failed and tell its author."""
+        async with async_session_maker() as session:
+            repo = PostRepository(session)
+            await repo.mark_failed(post_id, error)
+            author_id = await repo.get_author_id(post_id)
+            await session.commit()
+        
+        if author_id is None:
+            return
+        
+        self.failed += 1
+        logger.error("Publishing post %s failed permanently: %s", post_id, error)
+        await manager.send_personal_message(
+            str(author_id),
+            {"event": "post_failed", "data": {"id": str(post_id), "error": error}},
+        )
+    
+    def _staged_path(self, post_id: uuid.UUID) -> Path:
+        return self.staging_dir / str(post_id)
+
+
+# Singleton instance
+post_publisher = PostPublisher(
+    settings.post_publish_staging_dir,
+    workers=settings.post_publish_workers,
+    max_attempts=settings.post_publish_max_attempts,
+    retry_base_delay=settings.post_publish_retry_base_seconds,
+    lease_seconds=settings.post_publish_lease_seconds,
+)
@@ -0,0 +1,345 @@
+"""
+Suggestion engine - Friends-of-friends user recommendations.
+
+Candidates are scored by mutual follows: how many of the accounts a user
+follows also follow the candidate. Scores are computed from an in-memory
+copy of the followers table in CSR form (an offsets and a targets array
+of dense node numbers), so a request only walks the user's second-degree
+neighbourhood instead of reading the users table.
+
+Follows and unfollows are applied on top of the snapshot as they commit.
+The snapshot is reloaded every `suggestion_refresh_seconds`, or sooner
+once the overlay grows large, which also picks up changes made by other
+workers. The caller passes in who the user follows, read from the
+database, so the user's own follows are always current.
+
+The first snapshot loads in the background after startup; until then
+`suggest` returns None and callers fall back to the most followed users.
+"""
+import asyncio
+import heapq
+import logging
+import uuid
+from array import array
+from collections import Counter
+from collections.abc import Iterable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.database import async_session_maker
+from app.repositories.user import UserRepository
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# session.info key for follow changes waiting for their commit
+PENDING_KEY = "follow_graph_changes"
+
+# Edges read from the database per round trip while loading
+LOAD_BATCH_SIZE = 10_000
+
+# (follower_id, following_id, followed)
+FollowChange = tuple[uuid.UUID, uuid.UUID, bool]
+
+
+class FollowGraph:
+    """
+    The followers table as CSR arrays, plus an overlay of later changes.
+    
+    Users are numbered 0..n-1; node `i` follows
+    `targets[offsets[i]:offsets[i + 1]]`. Users added after the snapshot
+    get new numbers with no base edges.
+    """
+    
+    def __init__(
+        self,
+        ids: list[uuid.UUID],
+        index: dict[uuid.UUID, int],
+        follower_counts: array,
+        offsets: array,
+        targets: array,
+        popular_pool: int,
+    ):
+        self.ids = ids
+        self.index = index
+        self.follower_counts = follower_counts
+        self.offsets = offsets
+        self.targets = targets
+        self.base_size = len(offsets) - 1
+        # Edges followed / unfollowed since the snapshot, by follower
+        self.added: dict[int, set[int]] = {}
+        self.removed: dict[int, set[int]] = {}
+        self.overlay_edges = 0
+        # Fallback candidates, most followed first
+        self.popular = heapq.nlargest(popular_pool, range(len(ids)), key=follower_counts.__getitem__)
+    
+    @classmethod
+    def from_edges(
+        cls,
+        ids: list[uuid.UUID],
+        index: dict[uuid.UUID, int],
+        follower_counts: array,
+        sources: array,
+        destinations: array,
+        popular_pool: int,
+    ) -> "FollowGraph":
+        """Build the CSR arrays from parallel edge arrays (a counting sort by source)."""
+        offsets = array("i", [0]) * (len(ids) + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(len(ids)):
+            offsets[i + 1] += offsets[i]
+        
+        targets = array("i", [0]) * len(sources)
+        cursor = offsets[:-1]
+        for source, destination in zip(sources, destinations):
+            targets[cursor[source]] = destination
+            cursor[source] += 1
+        
+        return cls(ids, index, follower_counts, offsets, targets, popular_pool)
+    
+    def node(self, user_id: uuid.UUID, create: bool = False) -> int | None:
+        """Get a user's node number, adding the user if `create` is set."""
+        node = self.index.get(user_id)
+        if node is None and create:
+            node = len(self.ids)
+            self.ids.append(user_id)
+            self.index[user_id] = node
+            self.follower_counts.append(0)
+        return node
+    
+    def following(self, node: int) -> Iterable[int]:
+        """Nodes followed by `node`."""
+        base = self._base(node)
+        removed = self.removed.get(node)
+        if removed:
+            base = [n for n in base if n not in removed]
+        added = self.added.get(node)
+        return [*base, *added] if added else base
+    
+    def apply(self, source: int, destination: int, followed: bool) -> bool:
+        """
+        Record a follow or unfollow. Idempotent, so a change that the
+        snapshot already contains can be replayed safely.
+        
+        Returns:
+            bool: True if the graph changed
+        """
+        # Snapshot edges are overridden via `removed`, all others via `added`
+        in_base = destination in self._base(source)
+        overlay = self.removed if in_base else self.added
+        if followed == in_base:
+            changed = self._discard(overlay, source, destination)
+        else:
+            changed = self._add(overlay, source, destination)
+        
+        if changed:
+            self.follower_counts[destination] += 1 if followed else -1
+            self.overlay_edges += 1
+        return changed
+    
+    def _base(self, node: int) -> array | tuple:
+        if node >= self.base_size:
+            return ()
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+    
+    @staticmethod
+    def _add(edges: dict[int, set[int]], source: int, destination: int) -> bool:
+        nodes = edges.setdefault(source, set())
+        if destination in nodes:
+            return False
+        nodes.add(destination)
+        return True
+    
+    @staticmethod
+    def _discard(edges: dict[int, set[int]], source: int, destination: int) -> bool:
+        nodes = edges.get(source)
+        if not nodes or destination not in nodes:
+            return False
+        nodes.discard(destination)
+        return True
+
+
+class SuggestionEngine:
+    """Ranks accounts to follow from a per-worker `FollowGraph`."""
+    
+    def __init__(self, popular_pool: int, refresh_interval: float, max_overlay: int):
+        self.popular_pool = popular_pool
+        self.refresh_interval = refresh_interval
+        self.max_overlay = max_overlay
+        self.graph: FollowGraph | None = None
+        self._lock = asyncio.Lock()
+        # Changes committed while a reload is reading the database
+        self._journal: list[FollowChange] | None = None
+        self._stale = asyncio.Event()
+        self._refresher: asyncio.Task | None = None
+        self.reloads = 0
+        self.served = 0
+        self.fallbacks = 0
+    
+    def start(self) -> None:
+        """Load the graph in the background, then reload it periodically."""
+        self._refresher = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        if self._refresher:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+    
+    def suggest(self, user_id: uuid.UUID, following: set[uuid.UUID], limit: int) -> list[uuid.UUID] | None:
+        """
+        Get up to `limit` users for `user_id` to follow, best first.
+        
+        Ranked by mutual follows, ties broken by follower count; the most
+        followed accounts fill in when the user's network is too small.
+        The user and `following`, the accounts they already follow, are
+        excluded.
+        
+        Returns:
+            list[uuid.UUID] | None: None if the graph is not loaded yet
+        """
+        graph = self.graph
+        if graph is None:
+            self.fallbacks += 1
+            return None
+        
+        # First hop from `following`, second hop from the graph
+        followed_nodes = {n for n in map(graph.index.get, following) if n is not None}
+        scores: Counter[int] = Counter()
+        for followed in followed_nodes:
+            scores.update(graph.following(followed))
+        
+        excluded = followed_nodes | {graph.index.get(user_id)}
+        for excluded_node in excluded:
+            scores.pop(excluded_node, None)
+        
+        counts = graph.follower_counts
+        ranked = heapq.nlargest(limit, scores, key=lambda n: (scores[n], counts[n]))
+        
+        if len(ranked) < limit:
+            self.fallbacks += 1
+            chosen = excluded | set(ranked)
+            for candidate in graph.popular:
+                if len(ranked) == limit:
+                    break
+                if candidate not in chosen:
+                    ranked.append(candidate)
+        
+        self.served += 1
+        return [graph.ids[n] for n in ranked]
+    
+    def record_on_commit(
+        self,
+        session: AsyncSession,
+        follower_id: uuid.UUID,
+        following_id: uuid.UUID,
+        followed: bool,
+    ) -> None:
+        """Apply a follow (or unfollow) to the graph once the session commits."""
+        session.info.setdefault(PENDING_KEY, []).append((self, (follower_id, following_id, followed)))
+    
+    async def reload(self) -> None:
+        """Replace the graph with a fresh snapshot of the followers table."""
+        async with self._lock:
+            await self._reload()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        graph = self.graph
+        return {
+            "users": len(graph.ids) if graph else 0,
+            "edges": len(graph.targets) if graph else 0,
+            "overlay_edges": graph.overlay_edges if graph else 0,
+            "reloads": self.reloads,
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+        }
+    
+    async def _reload(self) -> None:
+        self._journal = []
+        try:
+            graph = await self._load()
+        finally:
+            journal, self._journal = self._journal, None
+        
+        # Changes already in the snapshot are no-ops
+        for change in journal:
+            self._apply_to(graph, change)
+        self.graph = graph
+        self.reloads += 1
+    
+    async def _load(self) -> FollowGraph:
+        async with async_session_maker() as session:
+            repo = UserRepository(session)
+            users = await repo.get_follower_counts()
+            
+            ids = [row.id for row in users]
+            index = {user_id: i for i, user_id in enumerate(ids)}
+            follower_counts = array("i", (row.follower_count for row in users))
+            
+            sources, destinations = array("i"), array("i")
+            async for batch in repo.stream_follow_edges(LOAD_BATCH_SIZE):
+                for follower_id, following_id in batch:
+                    source, destination = index.get(follower_id), index.get(following_id)
+                    # Users created after the scan above are picked up next time
+                    if source is not None and destination is not None:
+                        sources.append(source)
+                        destinations.append(destination)
+                # Let requests run between batches
+                await asyncio.sleep(0)
+        
+        # Still pure Python holding the GIL, but in a thread the event loop
+        # gets a turn every switch interval instead of waiting for the sort
+        return await asyncio.to_thread(
+            FollowGraph.from_edges,
+            ids, index, follower_counts, sources, destinations, self.popular_pool,
+        )
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Failed to reload the follow graph")
+            
+            try:
+                await asyncio.wait_for(self._stale.wait(), self.refresh_interval)
+            except TimeoutError:
+                pass
+            self._stale.clear()
+    
+    def _apply(self, change: FollowChange) -> None:
+        if self._journal is not None:
+            self._journal.append(change)
+        if self.graph is None:
+            return
+        
+        self._apply_to(self.graph, change)
+        if self.graph.overlay_edges >= self.max_overlay:
+            self._stale.set()
+    
+    @staticmethod
+    def _apply_to(graph: FollowGraph, change: FollowChange) -> None:
+        follower_id, following_id, followed = change
+        graph.apply(graph.node(follower_id, create=True), graph.node(following_id, create=True), followed)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for engine, change in session.info.pop(PENDING_KEY, ()):
+        engine._apply(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+# Singleton instance
+suggestion_engine = SuggestionEngine(
+    popular_pool=settings.suggestion_popular_pool,
+    refresh_interval=settings.suggestion_refresh_seconds,
+    max_overlay=settings.suggestion_overlay_max_edges,
+)
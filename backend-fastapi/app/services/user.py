@@ -2,15 +2,29 @@
 import uuid
 from fastapi import HTTPException, status, BackgroundTasks
 from app.models.user import User
+from app.config import get_settings
 from app.repositories.user import UserRepository
-from app.core.security import hash_password, verify_password, create_access_token
+from app.repositories.timeline import TimelineRepository
+from app.core.etag import make_etag
+from app.core.page_cache import feed_cache
+from app.services.suggestion_engine import suggestion_engine
+from app.core.security import (
+    Principal,
+    hash_password,
+    verify_password,
+    create_access_token,
+    invalidate_principal_on_commit,
+)
+
+settings = get_settings()
 
 
 class UserService:
     """Service layer for user business logic."""
     
-    def __init__(self, repo: UserRepository):
+    def __init__(self, repo: UserRepository, timeline_repo: TimelineRepository | None = None):
         self.repo = repo
+        self.timeline_repo = timeline_repo or TimelineRepository(repo.db)
     
     async def create_user(self, username: str, email: str, password: str) -> User:
         """
@@ -37,7 +51,7 @@ class UserService:
         user = User(
             user_name=username,
             email=email,
-            password=hash_password(password),
+            password=await hash_password(password),
         )
         
         return await self.repo.create(user)
@@ -48,13 +62,13 @@ class UserService:
         
         Returns:
             str: JWT access token
-            
+        
         Raises:
             HTTPException: If credentials are invalid
         """
         user = await self.repo.get_by_email(email)
         
-        if not user or not verify_password(password, user.password):
+        if not user or not await verify_password(password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -80,34 +94,89 @@ class UserService:
         
         return user
     
+    async def get_profile_etag(self, user_id: uuid.UUID) -> str:
+        """
+        ETag of a user's profile.
+        
+        Covers the user, their connections, posts and bookmarks; avatars of
+        other users embedded in the lists are not tracked.
+        
+        Raises:
+            HTTPException: If user not found
+        """
+        version = await self.repo.get_profile_version(user_id)
+        if version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        return make_etag("profile", user_id, tuple(version))
+    
     async def update_profile(
         self,
-        user: User,
+        user_id: uuid.UUID,
         bio: str | None = None,
         gender: str | None = None,
         profile_picture: str | None = None,
     ) -> User:
-        """Update user profile (partial update - PATCH)."""
+        """
+        Update user profile (partial update - PATCH).
+        
+        Raises:
+            HTTPException: If user not found
+        """
+        user = await self.repo.get_by_id(user_id)
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        
         if bio is not None:
             user.bio = bio
         if gender:
             user.gender = gender
         if profile_picture:
             user.profile_picture = profile_picture
+            # Posts embed their author's avatar
+            await self.repo.touch_posts(user.id)
+            feed_cache.clear_on_commit(self.repo.db)
         
-        return await self.repo.update(user)
+        user = await self.repo.update(user)
+        invalidate_principal_on_commit(self.repo.db, user.id)
+        return user
     
     async def get_suggested_users(self, current_user_id: uuid.UUID) -> list[User]:
-        """Get suggested users (all except current user)."""
-        return await self.repo.get_all_except(current_user_id)
+        """
+        Get up to `suggestion_limit` users to follow, best first.
+        
+        Ranked by mutual follows (friends of friends), topped up with the
+        most followed accounts; see `SuggestionEngine`. Only the most
+        followed accounts are suggested until the engine has loaded.
+        
+        Who the user follows is read here rather than from the engine,
+        which only sees this worker's follows until its next reload.
+        """
+        following = await self.repo.get_following_ids(current_user_id)
+        user_ids = suggestion_engine.suggest(current_user_id, following, settings.suggestion_limit)
+        if user_ids is None:
+            user_ids = await self.repo.get_most_followed_ids(current_user_id, settings.suggestion_limit)
+        users = {u.id: u for u in await self.repo.get_by_ids(user_ids)}
+        return [users[user_id] for user_id in user_ids if user_id in users]
     
-    async def follow_user(self, target_user_id: uuid.UUID, current_user: User) -> str:
+    async def follow_user(self, target_user_id: uuid.UUID, current_user: Principal) -> str:
         """
         Follow or unfollow a user.
         
+        The toggle is a conditional delete, falling back to a conditional
+        insert, on the followers table - neither side's follower list is
+        loaded. Following backfills the target's recent posts into the
+        current user's home timeline; unfollowing prunes them.
+        
         Returns:
             str: Status message
-            
+        
         Raises:
             HTTPException: If user tries to follow themselves or user not found
         """
@@ -117,34 +186,27 @@ class UserService:
                 detail="You cannot follow/unfollow yourself",
             )
         
-        target_user = await self.repo.get_by_id(target_user_id)
-        
-        if not target_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
+        if await self.repo.remove_follower(target_user_id, current_user.id):
+            await self.timeline_repo.prune(current_user.id, target_user_id)
+            suggestion_engine.record_on_commit(self.repo.db, current_user.id, target_user_id, followed=False)
+            return "Unfollowed successfully"
         
-        # Check if already following
-        target_with_followers = await self.repo.get_by_id(
-            target_user_id, with_relations=False
-        )
+        follower_count = await self.repo.add_follower(target_user_id, current_user.id)
         
-        # Reload to check followers
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        from app.models.user import User as UserModel
+        if follower_count is None:
+            if not await self.repo.exists(target_user_id):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found",
+                )
+            # A concurrent request already created the edge
+            return "Followed successfully"
         
-        result = await self.repo.db.execute(
-            select(UserModel)
-            .where(UserModel.id == target_user_id)
-            .options(selectinload(UserModel.followers))
-        )
-        target_with_followers = result.scalar_one()
+        suggestion_engine.record_on_commit(self.repo.db, current_user.id, target_user_id, followed=True)
         
-        if current_user in target_with_followers.followers:
-            await self.repo.remove_follower(target_user, current_user)
-            return "Unfollowed successfully"
-        else:
-            await self.repo.add_follower(target_user, current_user)
-            return "Followed successfully"
+        # High-follower authors are merged at read time, nothing to copy
+        if follower_count < settings.timeline_fanout_threshold:
+            await self.timeline_repo.backfill(
+                current_user.id, target_user_id, settings.timeline_backfill_limit
+            )
+        return "Followed successfully"
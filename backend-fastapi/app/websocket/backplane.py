@@ -0,0 +1,366 @@
+"""
+Pub/sub backplane for realtime events.
+
+Each worker process owns the sockets of the users connected to it. The
+backplane routes an event for a user to whichever worker(s) own that
+user's socket and keeps the presence registry shared by all workers.
+
+- `InMemoryBackplane`: single process, no external service.
+- `BrokerBackplane`: any number of workers sharing a broker process
+  (`python -m app.websocket.broker`), e.g. under `uvicorn --workers N`.
+
+Events published for a user are stamped with a per-user sequence number
+and kept in a bounded `EventLog`, so a reconnecting client can resume
+from the last sequence it saw instead of reloading everything.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Max bytes per newline-delimited frame (presence queries can list many users)
+FRAME_LIMIT = 16 * 1024 * 1024
+
+# Called with (user_id, text) for a user's event, or (None, text) for a broadcast
+Deliver = Callable[[str | None, str], None]
+
+
+@dataclass(slots=True)
+class UserLog:
+    """Last sequence issued to a user and their most recent events."""
+    seq: int
+    events: deque[str] = field(default_factory=deque)
+
+
+class EventLog:
+    """
+    Per-user event sequencing with a bounded replay log.
+    
+    Keeps the last `max_events` events for each of the `max_users` most
+    recently active users. Sequences start from the current time in
+    microseconds, so they keep increasing across restarts and evictions:
+    a position from a lost log never falls inside the current one.
+    """
+    
+    def __init__(self, max_events: int, max_users: int):
+        self.max_events = max_events
+        self.max_users = max_users
+        # Least recently used first
+        self._logs: OrderedDict[str, UserLog] = OrderedDict()
+        self.replayed = 0
+        self.resyncs = 0
+    
+    def append(self, user_id: str, text: str) -> str:
+        """
+        Sequence an event for a user and log it.
+        
+        `text` must be a non-empty JSON object; the returned frame is the
+        same object with a leading `"seq"` field.
+        """
+        log = self._get(user_id)
+        log.seq += 1
+        stamped = f'{{"seq": {log.seq}, {text[1:]}'
+        log.events.append(stamped)
+        return stamped
+    
+    def replay(self, user_id: str, resume_from: int | None) -> list[str]:
+        """
+        Get the frames a client resuming after `resume_from` has missed.
+        
+        Ends with a `resumed` event, or is only a `resync` event if the
+        client is new or its position is no longer covered by the log;
+        either carries the current sequence for the client to continue from.
+        """
+        log = self._get(user_id)
+        missed = log.seq - resume_from if resume_from is not None else -1
+        
+        if not 0 <= missed <= len(log.events):
+            self.resyncs += 1
+            return [json.dumps({"event": "resync", "data": {"seq": log.seq}})]
+        
+        # Sequences in a log are contiguous, so the missed events are its tail
+        frames = list(itertools.islice(log.events, len(log.events) - missed, None))
+        self.replayed += missed
+        frames.append(json.dumps({"event": "resumed", "data": {"seq": log.seq, "replayed": missed}}))
+        return frames
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "users": len(self._logs),
+            "events": sum(len(log.events) for log in self._logs.values()),
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+        }
+    
+    def _get(self, user_id: str) -> UserLog:
+        if log := self._logs.get(user_id):
+            self._logs.move_to_end(user_id)
+            return log
+        
+        log = self._logs[user_id] = UserLog(time.time_ns() // 1000, deque(maxlen=self.max_events))
+        if len(self._logs) > self.max_users:
+            self._logs.popitem(last=False)
+        return log
+
+
+def create_event_log() -> EventLog:
+    """Create an event log with the configured bounds."""
+    return EventLog(settings.realtime_log_max_events, settings.realtime_log_max_users)
+
+
+class Backplane(ABC):
+    """Routes events between workers and tracks which users are online."""
+    
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        """Begin delivering events for locally owned users to `deliver`."""
+    
+    @abstractmethod
+    async def stop(self) -> None:
+        """Disconnect and drop this worker's routes and presence."""
+    
+    @abstractmethod
+    async def own(self, user_id: str, resume_from: int | None = None) -> None:
+        """
+        Route this user's events to this worker.
+        
+        First delivers what the user missed since `resume_from` (or a
+        resync marker), ahead of any event published afterwards.
+        """
+    
+    @abstractmethod
+    async def disown(self, user_id: str) -> None:
+        """Stop routing this user's events to this worker."""
+    
+    @abstractmethod
+    async def publish(self, user_id: str, text: str, sequenced: bool = True) -> None:
+        """
+        Deliver a frame to the user on whichever worker owns their socket.
+        
+        Sequenced frames are also logged for replay; transient ones such
+        as presence updates are only delivered.
+        """
+    
+    @abstractmethod
+    async def broadcast(self, text: str) -> None:
+        """Deliver a frame to every connected user on every worker."""
+    
+    @abstractmethod
+    async def set_presence(self, user_id: str, online: bool) -> bool:
+        """
+        Register or unregister this worker's presence for a user.
+        
+        Returns:
+            bool: True if the user's global online state changed
+        """
+    
+    @abstractmethod
+    async def online_among(self, user_ids: frozenset[str]) -> list[str]:
+        """Get which of the given users are online on any worker."""
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {}
+
+
+class InMemoryBackplane(Backplane):
+    """Backplane for a single worker process."""
+    
+    def __init__(self, log: EventLog):
+        self.log = log
+        self._deliver: Deliver | None = None
+        self._owned: set[str] = set()
+        self._online: set[str] = set()
+    
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+    
+    async def stop(self) -> None:
+        self._owned.clear()
+        self._online.clear()
+    
+    async def own(self, user_id: str, resume_from: int | None = None) -> None:
+        self._owned.add(user_id)
+        for text in self.log.replay(user_id, resume_from):
+            self._deliver(user_id, text)
+    
+    async def disown(self, user_id: str) -> None:
+        self._owned.discard(user_id)
+    
+    async def publish(self, user_id: str, text: str, sequenced: bool = True) -> None:
+        if sequenced:
+            text = self.log.append(user_id, text)
+        if user_id in self._owned:
+            self._deliver(user_id, text)
+    
+    async def broadcast(self, text: str) -> None:
+        self._deliver(None, text)
+    
+    async def set_presence(self, user_id: str, online: bool) -> bool:
+        was_online = user_id in self._online
+        if online:
+            self._online.add(user_id)
+        else:
+            self._online.discard(user_id)
+        return was_online != online
+    
+    async def online_among(self, user_ids: frozenset[str]) -> list[str]:
+        return [u for u in user_ids if u in self._online]
+    
+    def stats(self) -> dict:
+        return self.log.stats()
+
+
+class BrokerBackplane(Backplane):
+    """
+    Backplane over a TCP connection to `app.websocket.broker`.
+    
+    Frames are newline-delimited JSON. The broker keeps the event log.
+    If the broker connection drops, the worker reconnects and re-registers
+    its routes and presence; events published while disconnected are
+    dropped, and a restarted broker makes clients resync.
+    """
+    
+    def __init__(self, host: str, port: int, request_timeout: float = 5.0, reconnect_delay: float = 1.0):
+        self.host = host
+        self.port = port
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self._deliver: Deliver | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._ids = itertools.count()
+        self._requests: dict[int, asyncio.Future] = {}
+        # Re-sent to the broker after a reconnect
+        self._owned: set[str] = set()
+        self._present: set[str] = set()
+    
+    async def start(self, deliver: Deliver) -> None:
+        """Connect in the background, so the app starts even if the broker isn't up yet."""
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._disconnect()
+    
+    async def own(self, user_id: str, resume_from: int | None = None) -> None:
+        self._owned.add(user_id)
+        await self._send({"op": "own", "user": user_id, "resume_from": resume_from})
+    
+    async def disown(self, user_id: str) -> None:
+        self._owned.discard(user_id)
+        await self._send({"op": "disown", "user": user_id})
+    
+    async def publish(self, user_id: str, text: str, sequenced: bool = True) -> None:
+        await self._send({"op": "publish", "user": user_id, "text": text, "sequenced": sequenced})
+    
+    async def broadcast(self, text: str) -> None:
+        await self._send({"op": "broadcast", "text": text})
+    
+    async def set_presence(self, user_id: str, online: bool) -> bool:
+        if online:
+            self._present.add(user_id)
+        else:
+            self._present.discard(user_id)
+        return bool(await self._request({"op": "presence", "user": user_id, "online": online}))
+    
+    async def online_among(self, user_ids: frozenset[str]) -> list[str]:
+        if not user_ids:
+            return []
+        return await self._request({"op": "online_among", "users": list(user_ids)}) or []
+    
+    async def _connect(self) -> None:
+        """Open the broker connection and re-register local state."""
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port, limit=FRAME_LIMIT
+        )
+        self._connected.set()
+        
+        # Routes only - there is no client waiting for a replay
+        for user_id in self._owned:
+            await self._send({"op": "own", "user": user_id})
+        for user_id in self._present:
+            await self._send({"op": "presence", "user": user_id, "online": True})
+    
+    def _disconnect(self) -> None:
+        self._connected.clear()
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        
+        for future in self._requests.values():
+            if not future.done():
+                future.set_result(None)
+        self._requests.clear()
+    
+    async def _run(self) -> None:
+        """Connect and read frames from the broker, reconnecting whenever it drops."""
+        while True:
+            try:
+                if not self._connected.is_set():
+                    await self._connect()
+                    logger.info("Connected to realtime broker")
+                await self._read_loop()
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            
+            logger.warning("No realtime broker connection, retrying")
+            self._disconnect()
+            await asyncio.sleep(self.reconnect_delay)
+    
+    async def _read_loop(self) -> None:
+        while line := await self._reader.readline():
+            frame = json.loads(line)
+            op = frame["op"]
+            if op == "deliver":
+                self._deliver(frame.get("user"), frame["text"])
+            elif op == "reply":
+                if future := self._requests.pop(frame["id"], None):
+                    future.set_result(frame["result"])
+    
+    async def _send(self, frame: dict) -> None:
+        if not self._connected.is_set():
+            logger.debug("Broker unavailable, dropping %s", frame["op"])
+            return
+        try:
+            self._writer.write(json.dumps(frame).encode() + b"\n")
+            await self._writer.drain()
+        except (OSError, RuntimeError):
+            # The read loop notices the dropped connection and reconnects
+            pass
+    
+    async def _request(self, frame: dict):
+        """Send a frame and wait for the broker's reply (None if unavailable)."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        await self._send({**frame, "id": request_id})
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._requests.pop(request_id, None)
+
+
+def create_backplane() -> Backplane:
+    """Create the configured backplane."""
+    if settings.realtime_backplane == "broker":
+        return BrokerBackplane(settings.realtime_broker_host, settings.realtime_broker_port)
+    return InMemoryBackplane(create_event_log())
@@ -0,0 +1,161 @@
+"""
+Local realtime broker for multi-worker deployments.
+
+Routes events between the workers' `BrokerBackplane` connections and
+holds the shared presence registry. Run it next to the app:
+
+    python -m app.websocket.broker --port 8765
+    REALTIME_BACKPLANE=broker uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+from app.config import get_settings
+from app.websocket.backplane import FRAME_LIMIT, EventLog, create_event_log
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class WorkerLink:
+    """
+    One worker connection with a bounded outbound queue drained by its own
+    writer task, so a slow worker can never delay delivery to the others.
+    """
+    
+    def __init__(self, writer: asyncio.StreamWriter, max_queue: int):
+        self.writer = writer
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=max_queue)
+        self.task: asyncio.Task | None = None
+    
+    def enqueue(self, data: bytes) -> bool:
+        """Queue an encoded frame; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class Broker:
+    """In-memory routing table, presence registry and event log shared by workers."""
+    
+    def __init__(self, log: EventLog, max_queue: int):
+        self.log = log
+        self.max_queue = max_queue
+        self.workers: set[WorkerLink] = set()
+        # user -> workers owning one of the user's sockets
+        self.routes: dict[str, set[WorkerLink]] = {}
+        # user -> workers that registered the user as online
+        self.presence: dict[str, set[WorkerLink]] = {}
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one worker connection."""
+        worker = WorkerLink(writer, self.max_queue)
+        worker.task = asyncio.create_task(self._write_loop(worker))
+        self.workers.add(worker)
+        try:
+            while line := await reader.readline():
+                self._dispatch(worker, json.loads(line))
+        except (OSError, asyncio.IncompleteReadError, json.JSONDecodeError):
+            pass
+        finally:
+            self._drop(worker)
+    
+    def _dispatch(self, worker: WorkerLink, frame: dict) -> None:
+        op = frame["op"]
+        
+        if op == "own":
+            self.routes.setdefault(frame["user"], set()).add(worker)
+            # Replayed before any later publish, on the same ordered queue
+            if "resume_from" in frame:
+                for text in self.log.replay(frame["user"], frame["resume_from"]):
+                    self._send(worker, _encode({"op": "deliver", "user": frame["user"], "text": text}))
+        elif op == "disown":
+            self._remove(self.routes, frame["user"], worker)
+        elif op == "publish":
+            text = frame["text"]
+            if frame.get("sequenced", True):
+                text = self.log.append(frame["user"], text)
+            # Encoded once for every owning worker
+            deliver = _encode({"op": "deliver", "user": frame["user"], "text": text})
+            for owner in list(self.routes.get(frame["user"], ())):
+                self._send(owner, deliver)
+        elif op == "broadcast":
+            deliver = _encode({"op": "deliver", "user": None, "text": frame["text"]})
+            for other in list(self.workers):
+                self._send(other, deliver)
+        elif op == "presence":
+            was_online = frame["user"] in self.presence
+            if frame["online"]:
+                self.presence.setdefault(frame["user"], set()).add(worker)
+            else:
+                self._remove(self.presence, frame["user"], worker)
+            changed = was_online != (frame["user"] in self.presence)
+            if "id" in frame:
+                self._send(worker, _encode({"op": "reply", "id": frame["id"], "result": changed}))
+        elif op == "online_among":
+            online = [u for u in frame["users"] if u in self.presence]
+            self._send(worker, _encode({"op": "reply", "id": frame["id"], "result": online}))
+    
+    def _send(self, worker: WorkerLink, data: bytes) -> None:
+        """Queue a frame for a worker, dropping the worker if it can't keep up."""
+        if not worker.enqueue(data):
+            # The worker reconnects and re-registers; its clients resync
+            logger.warning("Worker send queue full, disconnecting it")
+            self._drop(worker)
+    
+    async def _write_loop(self, worker: WorkerLink) -> None:
+        try:
+            while True:
+                worker.writer.write(await worker.queue.get())
+                # Hand everything already queued to the socket before waiting
+                while not worker.queue.empty():
+                    worker.writer.write(worker.queue.get_nowait())
+                await worker.writer.drain()
+        except (OSError, RuntimeError):
+            self._drop(worker)
+    
+    def _drop(self, worker: WorkerLink) -> None:
+        """Forget a worker that went away, with its routes and presence."""
+        if worker not in self.workers:
+            return
+        self.workers.discard(worker)
+        for table in (self.routes, self.presence):
+            for user_id in [u for u, owners in table.items() if worker in owners]:
+                self._remove(table, user_id, worker)
+        
+        if worker.task and worker.task is not asyncio.current_task():
+            worker.task.cancel()
+        worker.writer.close()
+    
+    @staticmethod
+    def _remove(table: dict[str, set], user_id: str, worker: WorkerLink) -> None:
+        if owners := table.get(user_id):
+            owners.discard(worker)
+            if not owners:
+                del table[user_id]
+
+
+def _encode(frame: dict) -> bytes:
+    return json.dumps(frame).encode() + b"\n"
+
+
+async def serve(host: str, port: int) -> None:
+    """Run the broker until cancelled."""
+    broker = Broker(create_event_log(), settings.realtime_broker_queue_size)
+    server = await asyncio.start_server(broker.handle, host, port, limit=FRAME_LIMIT)
+    logger.info("Realtime broker listening on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BIT-MITRA realtime broker")
+    parser.add_argument("--host", default=settings.realtime_broker_host)
+    parser.add_argument("--port", type=int, default=settings.realtime_broker_port)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port))
@@ -2,8 +2,48 @@
 WebSocket connection manager for real-time features.
 Follows FastAPI WebSocket documentation patterns.
 """
+import asyncio
 import json
-from fastapi import WebSocket, WebSocketDisconnect
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from fastapi import WebSocket, status
+from app.config import get_settings
+from app.core.serialization import embed_json
+from app.websocket.backplane import Backplane, create_backplane
+from app.websocket.presence import load_presence_audience
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    """
+    One client socket with a bounded send queue drained by its own writer task.
+    
+    Senders only enqueue, so a slow client can never delay delivery to
+    others; it fills its own queue and is evicted instead.
+    """
+    
+    def __init__(self, websocket: WebSocket, user_id: str, max_queue: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self.last_seen = time.monotonic()
+        self.writer: asyncio.Task | None = None
+        self.closed = False
+    
+    def enqueue(self, text: str) -> bool:
+        """Queue a frame; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+    
+    def touch(self) -> None:
+        """Record inbound activity for idle reaping."""
+        self.last_seen = time.monotonic()
 
 
 class ConnectionManager:
@@ -11,51 +51,279 @@ class ConnectionManager:
     Manages WebSocket connections as per FastAPI documentation.
     
     Reference: https://fastapi.tiangolo.com/advanced/websockets/
+    
+    Presence: a client gets a `presence_snapshot` of its online audience
+    on connect, then `user_online`/`user_offline` deltas. Changes are
+    coalesced over `presence_window`, so a quick reconnect is invisible.
+    
+    Events go through the backplane, which delivers them on whichever
+    worker owns the recipient's socket. Personal events carry a `seq`; a
+    client reconnecting with `resume_from` gets what it missed, then a
+    `resumed` event, or a `resync` event if it has to reload its state.
     """
     
-    def __init__(self):
-        # Map user_id -> WebSocket connection
-        self.active_connections: dict[str, WebSocket] = {}
+    def __init__(
+        self,
+        backplane: Backplane,
+        audience_loader: Callable[[str], Awaitable[frozenset[str]]],
+        max_queue: int = 256,
+        send_timeout: float = 10.0,
+        heartbeat_interval: float = 25.0,
+        idle_timeout: float = 60.0,
+        presence_window: float = 1.0,
+    ):
+        # Map user_id -> connection
+        self.active_connections: dict[str, Connection] = {}
+        self.backplane = backplane
+        self.audience_loader = audience_loader
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.presence_window = presence_window
+        # Audience of each online (or just disconnected) user
+        self._audiences: dict[str, frozenset[str]] = {}
+        # Latest online state per user since the last flush
+        self._presence_changes: dict[str, bool] = {}
+        # Users this worker has registered as online with the backplane
+        self._registered: set[str] = set()
+        self._presence_flush: asyncio.Task | None = None
+        self._reaper: asyncio.Task | None = None
+        # Keeps fire-and-forget eviction tasks referenced until they finish
+        self._pending: set[asyncio.Task] = set()
+        self.sent = 0
+        self.evicted = 0
     
-    async def connect(self, websocket: WebSocket, user_id: str):
-        """Accept and register a WebSocket connection."""
+    async def connect(self, websocket: WebSocket, user_id: str, resume_from: int | None = None) -> Connection:
+        """Accept and register a WebSocket connection, replaying missed events."""
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        await self.broadcast_online_users()
+        
+        audience = await self.audience_loader(user_id)
+        
+        # A new socket for the same user replaces the old one
+        if previous := self.active_connections.get(user_id):
+            await self._close(previous, status.WS_1008_POLICY_VIOLATION)
+        
+        connection = Connection(websocket, user_id, self.max_queue)
+        connection.writer = asyncio.create_task(self._write_loop(connection))
+        self.active_connections[user_id] = connection
+        self._audiences[user_id] = audience
+        await self.backplane.own(user_id, resume_from)
+        
+        online = await self.backplane.online_among(audience)
+        self._send(connection, json.dumps({"event": "presence_snapshot", "data": online}))
+        self._mark_presence(user_id, True)
+        return connection
     
-    def disconnect(self, user_id: str):
-        """Remove a WebSocket connection."""
-        self.active_connections.pop(user_id, None)
-    
-    async def broadcast_online_users(self):
-        """Broadcast list of online users to all connected clients."""
-        online_users = list(self.active_connections.keys())
-        await self.broadcast({"event": "online_users", "data": online_users})
+    async def disconnect(self, connection: Connection) -> None:
+        """Remove a WebSocket connection. Safe to call more than once."""
+        if self.active_connections.get(connection.user_id) is connection:
+            del self.active_connections[connection.user_id]
+            self._mark_presence(connection.user_id, False)
+            await self.backplane.disown(connection.user_id)
+        await self._close(connection)
     
     async def broadcast(self, message: dict):
-        """Send a message to all connected clients."""
-        for connection in self.active_connections.values():
-            try:
-                await connection.send_json(message)
-            except Exception:
-                pass
-    
-    async def send_personal_message(self, user_id: str, message: dict):
-        """Send a message to a specific user."""
-        if websocket := self.active_connections.get(user_id):
-            try:
-                await websocket.send_json(message)
-            except Exception:
-                pass
-    
-    async def send_message(self, user_id: str, message: dict):
+        """Send a message to all connected clients on every worker."""
+        # Encode once for every recipient
+        await self.backplane.broadcast(json.dumps(message))
+    
+    async def send_personal_message(self, user_id: str, message: dict | bytes):
+        """
+        Send a message to a specific user, wherever they are connected.
+        
+        `message` may already be serialized JSON, e.g. from `dump_json`.
+        """
+        text = message.decode() if isinstance(message, bytes) else json.dumps(message)
+        await self.backplane.publish(user_id, text)
+    
+    async def send_event(self, user_id: str, event: str, data: dict | bytes):
+        """Send an `{"event", "data"}` frame; `data` may be serialized JSON."""
+        if isinstance(data, bytes):
+            await self.send_personal_message(user_id, embed_json(data, "data", event=event))
+        else:
+            await self.send_personal_message(user_id, {"event": event, "data": data})
+    
+    async def send_message(self, user_id: str, message: dict | bytes):
         """Send a new chat message notification."""
-        await self.send_personal_message(user_id, {"event": "new_message", "data": message})
+        await self.send_event(user_id, "new_message", message)
     
-    async def send_notification(self, user_id: str, notification: dict):
+    async def send_notification(self, user_id: str, notification: dict | bytes):
         """Send a notification to a user."""
-        await self.send_personal_message(user_id, {"event": "notification", "data": notification})
+        await self.send_event(user_id, "notification", notification)
+    
+    def reply(self, connection: Connection, text: str) -> None:
+        """Send a raw frame on one connection, e.g. a pong."""
+        self._send(connection, text)
+    
+    async def start(self) -> None:
+        """Connect to the backplane and start the heartbeat/idle reaper."""
+        await self.backplane.start(self._deliver)
+        self._reaper = asyncio.create_task(self._reap_loop())
+    
+    async def stop(self) -> None:
+        """Stop background tasks and close every connection."""
+        for task in (self._reaper, self._presence_flush):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._reaper = self._presence_flush = None
+        
+        connections = list(self.active_connections.values())
+        self.active_connections.clear()
+        for connection in connections:
+            await self._close(connection, status.WS_1001_GOING_AWAY)
+        
+        await self.backplane.stop()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "connections": len(self.active_connections),
+            "queued_frames": sum(c.queue.qsize() for c in self.active_connections.values()),
+            "sent": self.sent,
+            "evicted": self.evicted,
+            "presence_pending": len(self._presence_changes),
+            "event_log": self.backplane.stats(),
+        }
+    
+    def _mark_presence(self, user_id: str, online: bool) -> None:
+        """Record a presence change and schedule a flush if none is pending."""
+        self._presence_changes[user_id] = online
+        if self._presence_flush is None or self._presence_flush.done():
+            self._presence_flush = asyncio.create_task(self._flush_presence())
+    
+    async def _flush_presence(self) -> None:
+        """
+        Every window, register this worker's presence changes with the
+        backplane and send online audience members their batched deltas.
+        """
+        while self._presence_changes:
+            await asyncio.sleep(self.presence_window)
+            changes, self._presence_changes = self._presence_changes, {}
+            
+            # Register every change before looking up recipients, so users
+            # coming online together (possibly on other workers) see each other
+            announcements: list[tuple[str, bool, frozenset[str]]] = []
+            registered: list[tuple[str, frozenset[str]]] = []
+            for user_id, online in changes.items():
+                audience = self._audiences.get(user_id, frozenset())
+                if not online:
+                    self._audiences.pop(user_id, None)
+                
+                # Reconnected (or dropped) again within the window - nothing to announce
+                if online == (user_id in self._registered):
+                    continue
+                
+                if online:
+                    self._registered.add(user_id)
+                    registered.append((user_id, audience))
+                else:
+                    self._registered.discard(user_id)
+                
+                # False if still online elsewhere (or already was)
+                if await self.backplane.set_presence(user_id, online):
+                    announcements.append((user_id, online, audience))
+            
+            # recipient -> event -> user IDs
+            outbox: dict[str, dict[str, list[str]]] = {}
+            for user_id, online, audience in announcements:
+                event = "user_online" if online else "user_offline"
+                for member in await self.backplane.online_among(audience):
+                    outbox.setdefault(member, {}).setdefault(event, []).append(user_id)
+            
+            for member, events in outbox.items():
+                for event, user_ids in events.items():
+                    await self.backplane.publish(
+                        member, json.dumps({"event": event, "data": user_ids}), sequenced=False
+                    )
+            
+            # The snapshot sent on connect predates this user's registration;
+            # anyone registered in between is only visible from now on
+            for user_id, audience in registered:
+                online = await self.backplane.online_among(audience)
+                await self.backplane.publish(
+                    user_id, json.dumps({"event": "presence_snapshot", "data": online}), sequenced=False
+                )
+    
+    def _deliver(self, user_id: str | None, text: str) -> None:
+        """Backplane callback: queue a frame for a local user, or all for a broadcast."""
+        if user_id is None:
+            for connection in list(self.active_connections.values()):
+                self._send(connection, text)
+        elif connection := self.active_connections.get(user_id):
+            self._send(connection, text)
+    
+    def _send(self, connection: Connection, text: str) -> None:
+        """Queue a frame, evicting the connection if it can't keep up."""
+        if connection.closed:
+            return
+        if not connection.enqueue(text):
+            self._evict(connection, "send queue full")
+    
+    async def _write_loop(self, connection: Connection) -> None:
+        """Drain one connection's queue; the only task that sends on its socket."""
+        try:
+            while True:
+                text = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(text), self.send_timeout)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._evict(connection, "send timed out")
+        except Exception:
+            self._evict(connection, "send failed")
+    
+    async def _reap_loop(self) -> None:
+        """
+        Ping every client periodically and evict those gone quiet.
+        
+        Clients answer the `ping` event with a "pong" frame, so a healthy
+        client that only listens still counts as active.
+        """
+        ping = json.dumps({"event": "ping"})
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            deadline = time.monotonic() - self.idle_timeout
+            for connection in list(self.active_connections.values()):
+                if connection.last_seen < deadline:
+                    self._evict(connection, "idle")
+                else:
+                    self._send(connection, ping)
+    
+    def _evict(self, connection: Connection, reason: str) -> None:
+        """Drop a connection from a synchronous context."""
+        if connection.closed:
+            return
+        
+        logger.info("Evicting WebSocket for user %s: %s", connection.user_id, reason)
+        self.evicted += 1
+        # Mark closed right away so nothing else is queued for it
+        connection.closed = True
+        task = asyncio.create_task(self.disconnect(connection))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _close(self, connection: Connection, code: int = status.WS_1000_NORMAL_CLOSURE) -> None:
+        """Stop the writer and close the socket."""
+        connection.closed = True
+        if connection.writer and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        try:
+            await connection.websocket.close(code)
+        except Exception:
+            # Already closed by the client or a previous call
+            pass
 
 
 # Singleton instance
-manager = ConnectionManager()
+manager = ConnectionManager(
+    create_backplane(),
+    load_presence_audience,
+    max_queue=settings.ws_send_queue_size,
+    send_timeout=settings.ws_send_timeout_seconds,
+    heartbeat_interval=settings.ws_heartbeat_interval_seconds,
+    idle_timeout=settings.ws_idle_timeout_seconds,
+    presence_window=settings.presence_coalesce_seconds,
+)
@@ -0,0 +1,38 @@
+"""
+Presence audiences.
+
+A user's presence is only shown to the users they are connected to
+(followers, followed users and conversation partners), so each change
+is delivered to that audience instead of to every online client.
+"""
+import uuid
+from app.config import get_settings
+from app.core.cache import TTLCache
+from app.database import async_session_maker
+from app.repositories.user import UserRepository
+
+settings = get_settings()
+
+# Reconnect storms after a deploy hit this instead of the database
+audience_cache: TTLCache[str, frozenset[str]] = TTLCache(
+    maxsize=settings.presence_audience_cache_size,
+    ttl=settings.presence_audience_ttl_seconds,
+)
+
+
+async def load_presence_audience(user_id: str) -> frozenset[str]:
+    """Get the IDs of users who may see this user's presence (cached)."""
+    if (audience := audience_cache.get(user_id)) is not None:
+        return audience
+    
+    try:
+        key = uuid.UUID(user_id)
+    except ValueError:
+        return frozenset()
+    
+    async with async_session_maker() as session:
+        ids = await UserRepository(session).get_connected_ids(key)
+    
+    audience = frozenset(str(i) for i in ids if i is not None)
+    audience_cache.set(user_id, audience)
+    return audience